@@ -1,11 +1,14 @@
 import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Tuple
 
 import numpy as np
 import pandas as pd
 
-from src.classes import Problem, Result
-from src.functions import set_problem
+from src.classes import Result
 
 pd.set_option('display.max_rows', None)  # display all rows.
 pd.set_option('display.float_format', '{:.2f}'.format)  # two decimals.
@@ -22,51 +25,123 @@ def parse_args():
     parser.add_argument("experiment", help="Experiment number.")
     parser.add_argument("-f", "--force", action="store_true",
                         help="Force computation; do not use cache.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes. Defaults to the "
+                             "number of processors on the machine.")
 
     return parser, parser.parse_args()
 
 
 def compute(parser, args):
     measures = []
+    operators = []
 
     num_instances = 144 if args.experiment == "tuning" else 100
     num_instances = 10 if "vq" in args.experiment else num_instances
 
-    for instance in np.arange(1, num_instances + 1):
-        data_loc = f"experiments/{args.experiment}/{instance}.json"
-        problem = Problem.from_file(data_loc)
-        set_problem(problem)
+    todo = []
 
-        res_loc = Path(f"experiments/{args.experiment}/"
-                       f"{instance}-{args.method}.json")
+    for instance in np.arange(1, num_instances + 1).tolist():
+        res_loc = Result.locate(f"experiments/{args.experiment}/"
+                                f"{instance}-{args.method}")
 
-        if not res_loc.exists():
-            print(f"{parser.prog}: {res_loc} does not exist; skipping.")
+        if res_loc is None:
+            print(f"{parser.prog}: no {args.method} result for instance "
+                  f"{instance}; skipping.")
             continue
 
-        res = Result.from_file(res_loc)
-        measures.append(dict(instance=instance) | res.measures())
+        cache_loc = Path(f"cache/{args.experiment}-{args.method}/"
+                         f"{instance}.json")
 
-    return pd.DataFrame.from_records(measures)
+        todo.append((instance, res_loc, cache_loc, args.force))
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        results = executor.map(measure, *zip(*todo)) if todo else []
+
+        for (instance, *_), (res_measures, op_measures) in zip(todo, results):
+            measures.append(dict(instance=instance) | res_measures)
+            operators.extend(dict(instance=instance) | op_measure
+                             for op_measure in op_measures)
+
+    return (pd.DataFrame.from_records(measures),
+            pd.DataFrame.from_records(operators))
+
+
+def measure(instance: int,
+            res_loc: Path,
+            cache_loc: Path,
+            force: bool = False) -> Tuple[dict, List[dict]]:
+    """
+    Returns the measures and operator measures of the given result. These are
+    cached per instance, and re-used for as long as the result file does not
+    change, unless ``force`` is set.
+    """
+    stat = res_loc.stat()
+    key = dict(instance=instance,
+               path=str(res_loc),
+               mtime=stat.st_mtime_ns,
+               size=stat.st_size)
+
+    if cache_loc.exists() and not force:
+        with open(cache_loc, "r") as fh:
+            cached = json.load(fh)
+
+        if cached["key"] == key:
+            return cached["measures"], cached["operators"]
+
+    res = Result.from_file(res_loc)
+    measures = res.measures()
+    operators = res.operator_measures()
+
+    cache_loc.parent.mkdir(parents=True, exist_ok=True)
+    tmp_loc = f"{cache_loc}.tmp"
+
+    with open(tmp_loc, "w") as fh:
+        json.dump(dict(key=key, measures=measures, operators=operators), fh)
+
+    os.replace(tmp_loc, cache_loc)
+
+    return measures, operators
+
+
+def aggregate_operators(operators: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates the per-instance operator measures into totals and averages
+    per operator, across all instances.
+    """
+    grouped = operators.groupby("operator")
+    totals = grouped[["calls (#)", "run-time (s)"]].sum()
+
+    totals["run-time (%)"] = grouped["run-time (%)"].mean()
+    totals["time per call (ms)"] = 1000 * totals["run-time (s)"] \
+        / totals["calls (#)"]
+    totals["learners per call (#)"] = grouped["learners per call (#)"].mean()
+    totals["new best (#)"] = grouped["new best (#)"].sum(min_count=1)
+
+    return totals
 
 
 def main():
     parser, args = parse_args()
 
-    cache = Path(f"cache/{args.experiment}-{args.method}.csv")
-
-    if cache.exists() and not args.force:
-        print(f"{parser.prog}: re-using {cache}.")
-        data = pd.read_csv(cache)
-    else:
-        data = compute(parser, args)
+    # The per-instance measures are cached, so only new or changed results
+    # are analysed. The aggregate files are always rewritten.
+    data, operators = compute(parser, args)
 
     data.set_index("instance", inplace=True)
 
     print(data, '\n')
     print("Aggregates:", data.aggregate("mean", numeric_only=True), sep="\n")
 
-    data.to_csv(cache)
+    Path("cache").mkdir(exist_ok=True)
+    data.to_csv(f"cache/{args.experiment}-{args.method}.csv")
+
+    # Only heuristic results with operator statistics have operator measures.
+    if not operators.empty:
+        op_loc = f"cache/{args.experiment}-{args.method}-operators.csv"
+
+        print("\nOperators:", aggregate_operators(operators), sep="\n")
+        operators.to_csv(op_loc, index=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List
+
+from src.classes import Problem, Result
+from src.functions import set_problem
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="batch",
+                                     description="Solve all instances of one "
+                                                 "or more experiments.")
+
+    parser.add_argument("method",
+                        help="Solution method to use."
+                             " One of {ilp, heuristic}.")
+
+    parser.add_argument("experiments", nargs="+",
+                        help="Experiments to solve. Ranges of experiments may "
+                             "be given as, e.g., 1-72.")
+
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes. Defaults to the "
+                             "number of processors on the machine.")
+
+    parser.add_argument("--sparse", action="store_true",
+                        help="Store the learner preferences sparsely (only "
+                             "used by the heuristic).")
+
+    parser.add_argument("--compact", action="store_true",
+                        help="Solve the compact ILP formulation (only used "
+                             "by the ILP).")
+
+    parser.add_argument("--solver", choices=["gurobi", "highs"],
+                        default="gurobi",
+                        help="MILP solver to use (only used by the ILP).")
+
+    return parser, parser.parse_args()
+
+
+def experiments(values: List[str]) -> List[str]:
+    """
+    Expands the passed-in experiment values, including ranges such as 1-72.
+    """
+    expanded = []
+
+    for value in values:
+        if "-" in value:
+            start, end = map(int, value.split("-"))
+            expanded.extend(str(exp) for exp in range(start, end + 1))
+        else:
+            expanded.append(value)
+
+    return expanded
+
+
+def instances(experiment: str) -> List[int]:
+    """
+    Returns the instances available in the given experiment's directory.
+    """
+    return sorted(int(loc.stem)
+                  for loc in Path(f"experiments/{experiment}").glob("*.json")
+                  if loc.stem.isdigit())
+
+
+def solve(method: str,
+          experiment: str,
+          instance: int,
+          sparse: bool = False,
+          compact: bool = False,
+          solver: str = "gurobi"):
+    """
+    Solves the given experiment instance using the passed-in method, and
+    writes the result to the experiment directory.
+    """
+    data_loc = f"experiments/{experiment}/{instance}.json"
+    res_loc = f"experiments/{experiment}/{instance}-{method}.npz"
+
+    problem = Problem.from_file(data_loc, sparse and method == "heuristic")
+    set_problem(problem)
+
+    if method == "heuristic":
+        from src.heuristic import get_seed, run_alns
+
+        exp = "tuning" if experiment == "tuning" else int(experiment)
+        res = run_alns(get_seed(exp, instance), None, problem)
+    else:
+        from src.ilp import ilp
+        res = ilp(compact, solver)
+
+    res.to_file(res_loc)
+
+
+def main():
+    parser, args = parse_args()
+
+    if args.method not in ["ilp", "heuristic"]:
+        parser.error(f"unknown method {args.method}.")
+
+    todo = []
+
+    for experiment in experiments(args.experiments):
+        for instance in instances(experiment):
+            res_loc = f"experiments/{experiment}/{instance}-{args.method}"
+
+            # Skipping instances that have already been solved allows an
+            # interrupted batch to resume where it stopped.
+            if not Result.exists(res_loc):
+                todo.append((experiment, instance))
+
+    print(f"{parser.prog}: {len(todo)} instances to solve.")
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = {executor.submit(solve,
+                                   args.method,
+                                   *item,
+                                   args.sparse,
+                                   args.compact,
+                                   args.solver):
+                   item for item in todo}
+
+        solved = 0
+        failed = 0
+
+        for future in as_completed(futures):
+            experiment, instance = futures[future]
+            hours = (time.perf_counter() - start) / 3600
+
+            try:
+                future.result()
+            except Exception as error:
+                failed += 1
+                print(f"{parser.prog}: {experiment}/{instance} failed: "
+                      f"{error}")
+                continue
+
+            # Only solved instances count towards the throughput, since failed
+            # instances typically fail fast, and would skew the estimate.
+            solved += 1
+            rate = solved / hours
+            remaining = len(todo) - solved - failed
+
+            print(f"{parser.prog}: solved {experiment}/{instance}"
+                  f" ({solved}/{len(todo)}, {failed} failed,"
+                  f" {rate:.1f} instances/hour,"
+                  f" {remaining / rate:.2f} hours remaining).")
+
+    hours = (time.perf_counter() - start) / 3600
+    print(f"{parser.prog}: solved {solved} and failed {failed} of "
+          f"{len(todo)} instances in {hours:.2f} hours.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy.random as rnd
+import pandas as pd
+
+from src.classes import Problem, Solution
+from src.destroy_operators import DESTROY_OPERATORS, random_learners
+from src.functions import initial_solution
+from src.local_search import reinsert_learner
+from src.make_experiments import make_instances, parameter_levels
+from src.repair_operators import REPAIR_OPERATORS, greedy_insert
+
+pd.set_option('display.max_rows', None)  # display all rows.
+pd.set_option('display.float_format', '{:.2f}'.format)  # two decimals.
+
+LEARNERS = [800, 1200, 1600]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="benchmark",
+                                     description="Times the operators and "
+                                                 "other hot paths of the "
+                                                 "heuristic on generated "
+                                                 "instances.")
+
+    parser.add_argument("--learners", type=int, nargs="+", default=LEARNERS,
+                        choices=LEARNERS,
+                        help="Instance sizes to benchmark, as the number of "
+                             "learners.")
+
+    parser.add_argument("--repeats", type=int, default=10,
+                        help="Number of timed calls per benchmark.")
+
+    parser.add_argument("--seed", type=int, default=42,
+                        help="Seed for the instances and solution states.")
+
+    parser.add_argument("--baseline", type=str,
+                        default="benchmarks/baseline.json",
+                        help="Baseline to compare against, if it exists.")
+
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write the results as the new baseline.")
+
+    parser.add_argument("--tolerance", type=float, default=.2,
+                        help="Relative slowdown (or memory increase) over the "
+                             "baseline that is reported as a regression.")
+
+    return parser, parser.parse_args()
+
+
+def make_problem(learners: int, seed: int) -> Problem:
+    """
+    Makes a single instance of the given size, with the generator of the
+    numerical experiments.
+    """
+    values = {key: value[0] for key, value in parameter_levels(False).items()}
+    values.update(learners=learners, instances=1, progress=1)
+
+    return next(make_instances(0, values, seed))
+
+
+def make_states(problem: Problem, seed: int) -> Dict[str, Solution]:
+    """
+    Returns the frozen solution states the operators are benchmarked on: a
+    complete solution, after some iterations of search, and that solution
+    with learners removed by a destroy operator.
+    """
+    generator = rnd.default_rng(seed)
+    complete = initial_solution(problem)
+
+    for _ in range(25):
+        complete = random_learners(complete, generator, problem)
+        complete = greedy_insert(complete, generator, problem)
+
+    destroyed = random_learners(deepcopy(complete), generator, problem)
+
+    return dict(complete=complete, destroyed=destroyed)
+
+
+def measure(func: Callable,
+            setup: Callable,
+            repeats: int,
+            number: int = 1) -> dict:
+    """
+    Measures the given function, which is passed the return value of setup.
+    The setup is not timed, and each timing consists of ``number`` calls.
+    Returns the number of calls per second (based on the fastest timing, as
+    ``timeit`` does), and the peak memory allocated in a single call.
+    """
+    runtimes = []
+
+    for _ in range(repeats):
+        args = setup()
+
+        start = time.perf_counter()
+
+        for _ in range(number):
+            func(*args)
+
+        runtimes.append((time.perf_counter() - start) / number)
+
+    # Allocations are measured separately, since tracing slows down the
+    # function quite a bit.
+    args = setup()
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"ops/sec": 1 / min(runtimes),
+            "peak (KiB)": peak / 1024}
+
+
+def benchmark(learners: int, seed: int, repeats: int) -> List[dict]:
+    problem = make_problem(learners, seed)
+    states = make_states(problem, seed)
+    records = []
+
+    def run(name: str, func: Callable, setup: Callable, number: int = 1):
+        record = dict(learners=learners, benchmark=name)
+        records.append(record | measure(func, setup, repeats, number))
+
+    def operator(state: str):
+        # Each call is passed a fresh copy of the frozen state, and the same
+        # random stream, so all calls perform the exact same work.
+        return lambda: (deepcopy(states[state]),
+                        rnd.default_rng(seed),
+                        problem)
+
+    for op in DESTROY_OPERATORS:
+        run(op.__name__, op, operator("complete"))
+
+    for op in REPAIR_OPERATORS:
+        run(op.__name__, op, operator("destroyed"))
+
+    run("reinsert_learner", reinsert_learner, operator("complete"))
+    run("initial_solution", initial_solution, lambda: (problem,))
+
+    complete = states["complete"]
+    run("Solution.objective", complete.objective, lambda: (), number=1_000)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        loc = Path(tmp_dir) / "1.json"
+        problem.to_file(loc)
+
+        run("Problem.from_file", Problem.from_file, lambda: (loc,))
+
+    return records
+
+
+def compare(data: pd.DataFrame,
+            baseline: pd.DataFrame,
+            tolerance: float) -> pd.DataFrame:
+    """
+    Compares the benchmark results against the baseline. Returns the relative
+    changes, and whether they are regressions beyond the given tolerance.
+    """
+    joined = data.join(baseline, rsuffix=" (baseline)", how="inner")
+
+    speed = joined["ops/sec"] / joined["ops/sec (baseline)"]
+    memory = joined["peak (KiB)"] / joined["peak (KiB) (baseline)"]
+
+    return pd.DataFrame({
+        "speed (x)": speed,
+        "memory (x)": memory,
+        "regression": (speed < 1 - tolerance) | (memory > 1 + tolerance),
+    })
+
+
+def main():
+    parser, args = parse_args()
+    baseline_loc = Path(args.baseline)
+
+    # Without a baseline, regressions cannot be detected. That should not
+    # pass silently.
+    if not baseline_loc.exists() and not args.save_baseline:
+        parser.error(f"baseline {baseline_loc} does not exist. Make one "
+                     f"first with --save-baseline.")
+
+    records = [record for learners in args.learners
+               for record in benchmark(learners, args.seed, args.repeats)]
+
+    data = pd.DataFrame.from_records(records)
+    data.set_index(["learners", "benchmark"], inplace=True)
+
+    print(data, '\n')
+
+    regression = False
+
+    if baseline_loc.exists():
+        with open(baseline_loc, "r") as fh:
+            baseline = pd.DataFrame.from_records(json.load(fh))
+            baseline.set_index(["learners", "benchmark"], inplace=True)
+
+        comparison = compare(data, baseline, args.tolerance)
+        regression = comparison["regression"].any()
+
+        print(f"Compared to {baseline_loc}:", comparison, sep="\n")
+
+    if args.save_baseline:
+        baseline_loc.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(baseline_loc, "w") as fh:
+            json.dump(records, fh, indent=2)
+
+    exit(1 if regression else 0)
+
+
+if __name__ == "__main__":
+    main()
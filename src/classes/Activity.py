@@ -1,57 +1,71 @@
 from __future__ import annotations
 
-from copy import copy
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import TYPE_CHECKING, List
 
 import numpy as np
 
+from src.constants import SELF_STUDY_MODULE_ID
 from .Classroom import Classroom
 from .Learner import Learner
 from .Module import Module
 from .Teacher import Teacher
 
+if TYPE_CHECKING:
+    from .Solution import Solution
 
-@dataclass
+
+@dataclass(frozen=True)
 class Activity:
-    learners: List[Learner]
-    classroom: Classroom
-    teacher: Teacher
-    module: Module
-    _objective: Optional[float] = None
-
-    def __deepcopy__(self, memo={}) -> Activity:
-        # This is not an *actual* deepcopy, but that's also not necessary
-        # - the objects themselves don't change, only their composition, and
-        # a shallow copy can account for that.
-        return Activity(copy(self.learners),
-                        self.classroom,
-                        self.teacher,
-                        self.module,
-                        self._objective)
+    """
+    View of a single activity in a solution. The activity's data are stored
+    in the solution's arrays, at index ``idx`` - this class only provides
+    convenient access to (and modification of) those data. Activities are
+    created via ``Solution.add_activity``.
+    """
+    solution: Solution
+    idx: int
+
+    @property
+    def learners(self) -> List[Learner]:
+        problem = self.solution._problem
+        return [problem.learners[idx] for idx in self.learner_ids().tolist()]
+
+    @property
+    def classroom(self) -> Classroom:
+        problem = self.solution._problem
+        return problem.classrooms[self.solution._classrooms[self.idx]]
+
+    @property
+    def teacher(self) -> Teacher:
+        problem = self.solution._problem
+        return problem.teachers[self.solution._teachers[self.idx]]
+
+    @property
+    def module(self) -> Module:
+        problem = self.solution._problem
+        return problem.modules[self.solution._modules[self.idx]]
 
     @property
     def num_learners(self) -> int:
-        return len(self.learners)
+        return int(self.solution._sizes[self.idx])
 
     @property
     def utilisation(self) -> float:
         return self.num_learners / self.classroom.capacity
 
     def learner_ids(self) -> np.ndarray:
-        return np.array([learner.id for learner in self.learners])
-
-    def objective(self):
-        if self._objective is None:
-            self._objective = self._compute_objective()
+        size = self.solution._sizes[self.idx]
+        return self.solution._members[self.idx, :size].copy()
 
-        return self._objective
+    def objective(self) -> float:
+        return self.solution._objectives[self.idx]
 
     def is_self_study(self) -> bool:
-        return self.module.is_self_study()
+        return self.solution._modules[self.idx] == SELF_STUDY_MODULE_ID
 
     def is_instruction(self) -> bool:
-        return not self.module.is_self_study()
+        return not self.is_self_study()
 
     def can_insert_learner(self, if_self_study: bool = False) -> bool:
         """
@@ -62,27 +76,22 @@ class Activity:
         if self.is_self_study() or if_self_study:
             return self.num_learners < self.classroom.capacity
 
-        from src.functions import get_problem
-        problem = get_problem()
-
+        problem = self.solution._problem
         return self.num_learners < min(problem.max_batch,
                                        self.classroom.capacity)
 
     def insert_learner(self, learner: Learner):
-        self.learners.append(learner)
-        self._objective = None
+        self.solution._move_learner(learner.id, self.idx)
 
     def remove_learner(self, learner: Learner):
-        self.learners.remove(learner)
-        self._objective = None
+        self.solution._move_learner(learner.id, -1)
 
     def remove_learners(self, learners: List[Learner]) -> int:
         """
         Attempts to remove the learners in the passed-in list. Returns the
         actual number removed (from the start of the list).
         """
-        from src.functions import get_problem
-        problem = get_problem()
+        problem = self.solution._problem
         removable = self.num_learners - problem.min_batch
 
         for learner in learners[:removable]:
@@ -95,8 +104,7 @@ class Activity:
         Tests if this activity can be split, that is, there are sufficient
         learners to break the activity up into two activities.
         """
-        from src.functions import get_problem
-        problem = get_problem()
+        problem = self.solution._problem
         return self.num_learners >= 2 * problem.min_batch
 
     def split_with(self, classroom: Classroom, teacher: Teacher) -> Activity:
@@ -109,8 +117,7 @@ class Activity:
         Does not check whether whether the passed-in classroom and teacher are
         qualified for the activity's module.
         """
-        from src.functions import get_problem
-        problem = get_problem()
+        problem = self.solution._problem
 
         if self.module.is_self_study():
             splitter = min(self.num_learners // 2, classroom.capacity)
@@ -120,23 +127,14 @@ class Activity:
                            problem.max_batch)
 
         learners = self.learners[-splitter:]
-        self.learners = self.learners[:-splitter]
-        self._objective = None
-
-        return Activity(learners, classroom, teacher, self.module)
+        return self.solution.add_activity(learners,
+                                          classroom,
+                                          teacher,
+                                          self.module)
 
     def switch_to_self_study(self):
-        from src.functions import get_problem
-        problem = get_problem()
-
-        self.module = problem.self_study_module
-        self._objective = None
-
-    def _compute_objective(self):
-        from src.functions import get_problem
-        problem = get_problem()
-
-        return problem.preferences[self.learner_ids(), self.module.id].sum()
+        problem = self.solution._problem
+        self.solution.switch_module(self, problem.self_study_module)
 
     def __str__(self):
         return (f"(#{self.num_learners},"
@@ -0,0 +1,199 @@
+import time
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from alns import ALNS, State
+from alns.Result import Result
+from alns.Statistics import Statistics
+from alns.accept import AcceptanceCriterion
+from alns.stop import MaxRuntime, StoppingCriterion
+from alns.weights import WeightScheme
+
+# Candidate solution outcomes, as used by the weight schemes.
+_BEST = 0
+_BETTER = 1
+_ACCEPT = 2
+_REJECT = 3
+
+
+@dataclass
+class SearchState:
+    """
+    State of the search in between iterations: the current and best solutions,
+    the operator weights, the acceptance and stopping criteria, the statistics,
+    and the state of the random number generator. This suffices to resume the
+    search exactly where it was left, also after pickling.
+    """
+    curr: State
+    best: State
+    weight_scheme: WeightScheme
+    crit: AcceptanceCriterion
+    stop: StoppingCriterion
+    stats: Statistics
+    rnd_state: Optional[dict] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        # The statistics use defaultdicts with lambda factories, which cannot
+        # be pickled. So we store their contents instead.
+        stats = self.stats
+        state['stats'] = (stats._objectives,
+                          stats._runtimes,
+                          dict(stats._destroy_operator_counts),
+                          dict(stats._repair_operator_counts))
+
+        state['time'] = time.perf_counter()
+        return state
+
+    def __setstate__(self, state):
+        objectives, runtimes, d_counts, r_counts = state.pop('stats')
+
+        # Timestamps are only meaningful within the process that recorded
+        # them. They are shifted such that the search continues from the
+        # current time, as if it had never been interrupted.
+        shift = time.perf_counter() - state.pop('time')
+
+        stats = Statistics()
+        stats._objectives = objectives
+        stats._runtimes = [runtime + shift for runtime in runtimes]
+        stats._destroy_operator_counts.update(d_counts)
+        stats._repair_operator_counts.update(r_counts)
+
+        stop = state['stop']
+
+        if isinstance(stop, MaxRuntime) and stop._start_runtime is not None:
+            stop._start_runtime += shift
+
+        self.__dict__.update(state, stats=stats)
+
+
+class InPlaceALNS(ALNS):
+    """
+    ALNS variant for operators that modify the passed-in solution in place,
+    rather than returning a modified copy. The operators are passed a copy of
+    the current solution, as in the regular ALNS algorithm.
+    """
+
+    def __init__(self, rnd_state):
+        super().__init__(rnd_state)
+        self._checkpoint = None
+
+    def on_checkpoint(self,
+                      func: Callable[[SearchState], None],
+                      interval: Optional[float] = None,
+                      on_best: bool = False):
+        """
+        Sets a callback that is passed the state of the search. The callback
+        is called after an iteration, once at least ``interval`` seconds have
+        passed since the previous call, and, when ``on_best`` is set, after
+        every iteration that found a new best solution. It is also called once
+        the search stops.
+
+        The state refers to the live solutions and criteria of the search, so
+        it should be used (e.g., written to file) right away.
+        """
+        self._checkpoint = (func, interval, on_best)
+
+    def iterate(self,
+                initial_solution: State,
+                weight_scheme: WeightScheme,
+                crit: AcceptanceCriterion,
+                stop: StoppingCriterion,
+                **kwargs) -> Result:
+        stats = Statistics()
+        stats.collect_objective(initial_solution.objective())
+        stats.collect_runtime(time.perf_counter())
+
+        state = SearchState(initial_solution,
+                            deepcopy(initial_solution),
+                            weight_scheme,
+                            crit,
+                            stop,
+                            stats)
+
+        return self.resume(state, **kwargs)
+
+    def resume(self, state: SearchState, **kwargs) -> Result:
+        """
+        Continues the search from the given state, as obtained from a
+        checkpoint callback. The search then follows the exact same trajectory
+        as it would have, had it not been interrupted.
+        """
+        if len(self.destroy_operators) == 0 or len(self.repair_operators) == 0:
+            raise ValueError("Missing destroy or repair operators.")
+
+        if state.rnd_state is not None:
+            self._rnd_state.bit_generator.state = state.rnd_state
+
+        curr = state.curr
+        best = state.best
+        weight_scheme = state.weight_scheme
+        crit = state.crit
+        stop = state.stop
+        stats = state.stats
+
+        op_coupling = self._compute_op_coupling()
+        last_checkpoint = time.perf_counter()
+
+        while not stop(self._rnd_state, best, curr):
+            d_idx, r_idx = weight_scheme.select_operators(self._rnd_state,
+                                                          op_coupling)
+
+            d_name, d_operator = self.destroy_operators[d_idx]
+            r_name, r_operator = self.repair_operators[r_idx]
+
+            cand = deepcopy(curr)
+            cand = d_operator(cand, self._rnd_state, **kwargs)
+            cand = r_operator(cand, self._rnd_state, **kwargs)
+
+            # Mirrors ALNS._eval_cand: the acceptance criterion is always
+            # evaluated, and a new best is accepted regardless of its outcome.
+            accept = crit(self._rnd_state, best, curr, cand)
+
+            if cand.objective() < best.objective():
+                s_idx = _BEST
+            elif accept:
+                s_idx = _BETTER if cand.objective() < curr.objective() \
+                    else _ACCEPT
+            else:
+                s_idx = _REJECT
+
+            if s_idx != _REJECT:
+                curr = cand
+
+                if s_idx == _BEST:
+                    if self._on_best:
+                        curr = self._on_best(curr, self._rnd_state, **kwargs)
+
+                    best = deepcopy(curr)
+
+            weight_scheme.update_weights(d_idx, r_idx, s_idx)
+
+            stats.collect_objective(curr.objective())
+            stats.collect_destroy_operator(d_name, s_idx)
+            stats.collect_repair_operator(r_name, s_idx)
+            stats.collect_runtime(time.perf_counter())
+
+            if self._checkpoint is not None:
+                func, interval, on_best = self._checkpoint
+                now = time.perf_counter()
+
+                if (on_best and s_idx == _BEST) \
+                        or (interval is not None
+                            and now - last_checkpoint >= interval):
+                    func(self._state(curr, best, weight_scheme, crit, stop,
+                                     stats))
+                    last_checkpoint = time.perf_counter()
+
+        if self._checkpoint is not None:
+            func, *_ = self._checkpoint
+            func(self._state(curr, best, weight_scheme, crit, stop, stats))
+
+        return Result(best, stats)
+
+    def _state(self, curr, best, weight_scheme, crit, stop, stats):
+        rnd_state = deepcopy(self._rnd_state.bit_generator.state)
+        return SearchState(curr, best, weight_scheme, crit, stop, stats,
+                           rnd_state)
@@ -0,0 +1,53 @@
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Callable, Dict
+
+
+class OperatorStatistics:
+    """
+    Instrumentation for the ALNS operators. Operators wrapped by ``instrument``
+    record their number of calls, total wall time, and the number of learners
+    they (un)assigned.
+    """
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.runtimes = defaultdict(float)
+        self.learners = defaultdict(int)
+
+    def instrument(self, operator: Callable) -> Callable:
+        """
+        Returns a wrapped version of the passed-in operator (or on best hook),
+        which records its statistics under the operator's name.
+        """
+        name = operator.__name__
+
+        @wraps(operator)
+        def instrumented(solution, generator, **kwargs):
+            num_unassigned = solution.num_unassigned
+            start = time.perf_counter()
+
+            solution = operator(solution, generator, **kwargs)
+
+            self.runtimes[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+            # Destroy operators unassign learners, and repair operators
+            # assign them again.
+            num_changed = abs(solution.num_unassigned - num_unassigned)
+            self.learners[name] += num_changed
+
+            return solution
+
+        return instrumented
+
+    def to_dict(self) -> Dict[str, dict]:
+        """
+        Returns the recorded statistics, as a dictionary of operator names to
+        their calls, runtime (in seconds), and number of learners.
+        """
+        return {name: dict(calls=self.calls[name],
+                           runtime=self.runtimes[name],
+                           learners=self.learners[name])
+                for name in self.calls}
@@ -2,52 +2,168 @@ from __future__ import annotations
 
 import json
 from collections import defaultdict
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from functools import cached_property
-from heapq import heapify
+from pathlib import Path
 
 import numpy as np
-from scipy import sparse
+from scipy.sparse import coo_matrix, csr_matrix, issparse
 
 from src.constants import SELF_STUDY_MODULE_ID
 from .Classroom import Classroom
 from .Learner import Learner
 from .Module import Module
+from .ResourcePools import ResourcePools
+from .SparsePreferences import SparsePreferences
 from .Teacher import Teacher
 
+_HEADER = "header.json"
+
+_ENTITIES = {
+    'learners': Learner,
+    'teachers': Teacher,
+    'classrooms': Classroom,
+    'modules': Module,
+}
+
+_ARRAYS = ['preferences', *_ENTITIES]
+
+# The preferences are also stored as the arrays of a CSR matrix, which are
+# used in sparse mode. Then the dense matrix is never loaded.
+_CSR_ARRAYS = ['data', 'indices', 'indptr']
+
 
 @dataclass(frozen=True)
 class Problem:
     _data: dict[str, ...] = field(hash=False)
+    sparse: bool = False
 
     @classmethod
-    def from_file(cls, loc: str) -> Problem:
+    def from_file(cls, loc: str, sparse: bool = False) -> Problem:
         """
         Builds a Problem object for the experiment data file at the given
-        location.
+        location. The data may be stored as JSON, or in the binary format
+        written by ``to_file``. When a binary version of a JSON data file
+        exists (e.g. ``1/`` for ``1.json``), the binary version is used.
+
+        When ``sparse`` is set, the learner preferences are stored sparsely.
+        See ``preferences`` for details.
         """
+        binary_loc = Path(loc).with_suffix("")
+
+        if (binary_loc / _HEADER).exists():
+            return cls._from_binary(binary_loc, sparse)
+
+        return cls._from_json(loc, sparse)
+
+    @classmethod
+    def _from_json(cls, loc: str, sparse: bool = False) -> Problem:
         with open(loc, "r") as file:
             data = json.load(file)
 
-        p = np.zeros((len(data['learners']), len(data['modules'])))
+        shape = (len(data['learners']), len(data['modules']))
+        idcs, prefs = zip(*data['preferences']) \
+            if data['preferences'] else ([], [])
+
+        rows, cols = np.transpose(idcs).reshape(2, -1)
 
-        for (l, m), pref in data['preferences']:
-            p[l, m] = pref
+        if sparse:
+            p = csr_matrix((prefs, (rows, cols)), shape=shape)
+        else:
+            p = np.zeros(shape)
+            p[rows, cols] = prefs
 
         data = {**data, 'preferences': p}
-        return cls(data)
+        return cls(data, sparse)
+
+    @classmethod
+    def _from_binary(cls, loc: Path, sparse: bool = False) -> Problem:
+        with open(loc / _HEADER, "r") as file:
+            data = json.load(file)
+
+        # The arrays are memory-mapped, so only those parts that are actually
+        # used are read from disk.
+        for key in _ENTITIES:
+            data[key] = np.load(loc / f"{key}.npy", mmap_mode="r")
+
+        csr_locs = [loc / f"preferences_{key}.npy" for key in _CSR_ARRAYS]
+
+        if sparse and all(csr_loc.exists() for csr_loc in csr_locs):
+            shape = (len(data['learners']), len(data['modules']))
+            arrays = tuple(np.load(csr_loc) for csr_loc in csr_locs)
+            data['preferences'] = csr_matrix(arrays, shape=shape)
+        else:
+            # Files written before the CSR arrays were stored only have the
+            # dense preferences, which are then converted in sparse mode.
+            p = np.load(loc / "preferences.npy", mmap_mode="r")
+            data['preferences'] = csr_matrix(p) if sparse else p
+
+        return cls(data, sparse)
 
     def to_file(self, loc: str):
         """
-        Writes the problem data to the given location.
+        Writes the problem data to the given location. Locations ending in
+        ``.json`` are written as JSON; otherwise, the data are written in a
+        binary format: a directory of NumPy arrays, and a JSON header with the
+        remaining data.
         """
+        if Path(loc).suffix != ".json":
+            return self._to_binary(Path(loc))
+
         with open(loc, "w") as file:
-            p = sparse.dok_matrix(self._data['preferences'])
-            p = list([tuple(map(int, k)), float(v)] for k, v in p.items())
+            p = coo_matrix(self._data['preferences'])
+            idcs = np.transpose([p.row, p.col])
+            p = [[idx, pref] for idx, pref in zip(idcs.tolist(),
+                                                  p.data.tolist())]
 
             data = {**self._data, 'preferences': p}
+
+            for key in _ENTITIES:
+                data[key] = self._records(key)
+
             json.dump(data, file)
 
+    def _to_binary(self, loc: Path):
+        loc.mkdir(parents=True, exist_ok=True)
+
+        for key, entity in _ENTITIES.items():
+            dtype = [(field.name, field.type) for field in fields(entity)]
+            records = [tuple(record[name] for name, _ in dtype)
+                       for record in self._records(key)]
+
+            np.save(loc / f"{key}.npy", np.array(records, dtype=dtype))
+
+        preferences = self._data['preferences']
+        matrix = csr_matrix(preferences)
+        matrix.sum_duplicates()  # also sorts the indices within each row
+
+        if issparse(preferences):
+            preferences = preferences.toarray()
+
+        np.save(loc / "preferences.npy", preferences)
+
+        for key in _CSR_ARRAYS:
+            np.save(loc / f"preferences_{key}.npy", getattr(matrix, key))
+
+        with open(loc / _HEADER, "w") as file:
+            header = {key: value for key, value in self._data.items()
+                      if key not in _ARRAYS}
+
+            json.dump(header, file)
+
+    def _records(self, key: str) -> list[dict]:
+        """
+        Returns the data for the given entity (e.g. 'learners') as a list of
+        dictionaries, regardless of whether these are stored as such, or as a
+        (memory-mapped) structured array.
+        """
+        data = self._data[key]
+
+        if isinstance(data, np.ndarray):
+            return [dict(zip(data.dtype.names, row)) for row in data.tolist()]
+
+        return data
+
     @cached_property
     def instance(self) -> int:
         return int(self._data['instance'])
@@ -64,13 +180,23 @@ class Problem:
         return (len(self.modules) - 1) // 48
 
     @cached_property
-    def preferences(self) -> np.ndarray:
+    def preferences(self) -> np.ndarray | SparsePreferences:
         """
         Learner preferences, as a NumPy array. Preferences as a matrix of
         learners (rows) to modules (column), where each element represents the
         preference of the given learner for the given module. When a preference
         is zero, the learner is ineligible to take given module.
+
+        For sparse problems, the preferences are instead stored as a
+        ``SparsePreferences`` object, which supports the same element lookups.
+        Each learner holds only a few nonzero preferences, so this takes much
+        less memory.
         """
+        if self.sparse:
+            preferences = csr_matrix(self._data["preferences"])
+            max_pref = preferences.max(axis=1).toarray().ravel()
+            return SparsePreferences(preferences, self.penalty * max_pref)
+
         preferences = np.asarray(self._data["preferences"])
 
         # Preferences, and the self-study module preference. The self-study
@@ -85,12 +211,43 @@ class Problem:
         """
         Returns the most preferred module (index/ID) per learner.
         """
-        by_module = np.argsort(-self.preferences[:, :-1], axis=1)
+        if self.sparse:
+            return self._most_preferred_sparse()
+
+        # A stable sort, so ties are broken by module ID, as in the sparse
+        # case.
+        by_module = np.argsort(-self.preferences[:, :-1],
+                               axis=1,
+                               kind="stable")
 
         # Since only one module per course may be preferred, we can safely
         # discard all the others.
         return by_module[:, :self.num_courses]
 
+    def _most_preferred_sparse(self) -> np.ndarray:
+        matrix = self.preferences.matrix
+        counts = np.diff(matrix.indptr)
+        rows = np.repeat(np.arange(self.num_learners), counts)
+
+        # Sorts the nonzero preferences by learner, and then by preference
+        # (high to low). The rank is the position within each learner's row.
+        order = np.lexsort((-matrix.data, rows))
+        rank = np.arange(len(rows)) - matrix.indptr[rows]
+        keep = rank < self.num_courses
+
+        by_module = np.empty((self.num_learners, self.num_courses), dtype=int)
+        by_module[rows[keep], rank[keep]] = matrix.indices[order][keep]
+
+        # Learners with fewer preferred modules than courses are padded with
+        # modules they are ineligible for, like in the dense case.
+        for row in np.flatnonzero(counts < self.num_courses):
+            indices, _ = self.preferences.row(row)
+            ineligible = np.setdiff1d(np.arange(matrix.shape[1]), indices)
+            by_module[row, counts[row]:] = \
+                ineligible[:self.num_courses - counts[row]]
+
+        return by_module
+
     @cached_property
     def prefers_over_self_study(self) -> dict[int, list[int]]:
         """
@@ -98,22 +255,27 @@ class Problem:
         preferred over the self-study assignment.
         """
         most_preferred = self.most_preferred
+        learner_ids = np.arange(self.num_learners)
+
+        prefs = self.preferences[learner_ids[:, None], most_preferred]
+        self_study_prefs = self.preferences[learner_ids, SELF_STUDY_MODULE_ID]
+        prefers = prefs > self_study_prefs[:, None]
+
         grouped = defaultdict(list)
 
-        for learner in self.learners:
-            for module_id in most_preferred[learner.id]:
-                if learner.prefers_over_self_study(self.modules[module_id]):
-                    grouped[learner.id].append(module_id)
+        for learner_id in np.flatnonzero(prefers.any(axis=1)).tolist():
+            modules = most_preferred[learner_id, prefers[learner_id]]
+            grouped[learner_id] = modules.tolist()
 
         return grouped
 
     @cached_property
     def learners(self) -> list[Learner]:
-        return [Learner(**data) for data in self._data['learners']]
+        return [Learner(**data) for data in self._records('learners')]
 
     @cached_property
     def teachers(self) -> list[Teacher]:
-        return [Teacher(**data) for data in self._data['teachers']]
+        return [Teacher(**data) for data in self._records('teachers')]
 
     @cached_property
     def teachers_by_module(self) -> dict[Module, list[Teacher]]:
@@ -127,20 +289,55 @@ class Problem:
 
     @cached_property
     def classrooms(self) -> list[Classroom]:
-        return [Classroom(**data) for data in self._data['classrooms']]
+        return [Classroom(**data) for data in self._records('classrooms')]
 
     @cached_property
     def classrooms_by_module(self) -> dict[Module, list[Classroom]]:
         return {m: [c for c in self.classrooms if c.is_qualified_for(m)]
                 for m in self.modules}
 
+    @cached_property
+    def classroom_pools(self) -> ResourcePools:
+        """
+        Returns the IDs of the qualified classrooms, per module, in order of
+        preference (by ID). Modules that share the same qualified classrooms,
+        e.g. those of the same room type, share a single pool.
+        """
+        return ResourcePools({m: [classroom.id for classroom in classrooms]
+                              for m, classrooms
+                              in self.classrooms_by_module.items()},
+                             len(self.classrooms))
+
+    @cached_property
+    def teacher_pools(self) -> ResourcePools:
+        """
+        Returns the IDs of the qualified teachers, per module, in order of
+        preference. Modules that share the same qualified teachers, e.g. those
+        of the same course and qualification, share a single pool.
+
+        We prefer the worst qualifying teacher - e.g. for a second degree
+        module, we would first want to exhaust second degree teachers rather
+        than first degree, because those can be used to teach first degree
+        modules as well. Ties are broken by ID.
+        """
+        pools = {}
+
+        for module in self.modules:
+            teachers = [teacher for teacher in self.teachers_by_module[module]
+                        if teacher.is_qualified_for(module)]
+            teachers.sort(key=lambda teacher: (-teacher.degree, teacher.id))
+
+            pools[module] = [teacher.id for teacher in teachers]
+
+        return ResourcePools(pools, len(self.teachers))
+
     @cached_property
     def modules(self) -> list[Module]:
         """
         Returns a list of modules. The last module in the list is the
         self-study module.
         """
-        modules = [Module(**data) for data in self._data['modules']]
+        modules = [Module(**data) for data in self._records('modules')]
         modules.append(self.self_study_module)
 
         return modules
@@ -169,33 +366,3 @@ class Problem:
         Maximum group size for instruction activities.
         """
         return self._data['max_batch']
-
-    def preferences_by_module(
-            self,
-            learner_ids: list[int]
-    ) -> list[tuple[float, int, list[int]]]:
-        """
-        Computes the aggregate learner preferences by module, for the passed-in
-        learners. This list consists only of modules and learners for which the
-        minimum batch size is respected.
-
-        The list forms a heap, ordered by aggregate learner preferences (high
-        to low). Use ``heapq`` for modification and access.
-        """
-        learners_by_module = defaultdict(list)
-
-        for learner_id in learner_ids:
-            for module_id in self.prefers_over_self_study[learner_id]:
-                learners_by_module[module_id].append(learner_id)
-
-        # Heap of (aggregate preference, module, learner_ids) tuples.
-        # Preferences are negative since heapq creates a min heap (and
-        # we need a max heap).
-        histogram = [(-self.preferences[learners, mod_id].sum(),
-                      mod_id,
-                      learners)
-                     for mod_id, learners in learners_by_module.items()
-                     if len(learners) >= self.min_batch]
-
-        heapify(histogram)
-        return histogram
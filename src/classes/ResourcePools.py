@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from .Module import Module
+
+
+class ResourcePools:
+    """
+    Pools of qualified resources (classroom or teacher IDs), per module, in
+    order of preference. Modules that share the same qualified resources, e.g.
+    those of the same room type, share a single pool.
+
+    For each resource, the pools it is part of are indexed as well, along with
+    its position in each of these pools. That allows a solution to keep track
+    of the first free resource in each pool, see ``Solution``.
+    """
+
+    def __init__(self, pools: Dict[Module, List[int]], num_resources: int):
+        index = {}
+
+        self.pools: List[Tuple[int, ...]] = []
+        self.pool_of: Dict[Module, int] = {}
+
+        for module, ids in pools.items():
+            if (key := tuple(ids)) not in index:
+                index[key] = len(self.pools)
+                self.pools.append(key)
+
+            self.pool_of[module] = index[key]
+
+        # Pairs of (pool index, position in pool), for each resource.
+        self.memberships: List[List[Tuple[int, int]]] = \
+            [[] for _ in range(num_resources)]
+
+        for pool_idx, pool in enumerate(self.pools):
+            for pos, resource in enumerate(pool):
+                self.memberships[resource].append((pool_idx, pos))
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    def __getitem__(self, module: Module) -> Tuple[int, ...]:
+        return self.pools[self.pool_of[module]]
@@ -1,51 +1,165 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, fields
 from functools import cached_property
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
 
+from src.constants import SELF_STUDY_MODULE_ID
 from .Solution import Solution
 
+_HEADER = "header"
+
+# Columns of the binary result format, and their types.
+_COLUMNS = {
+    'assignments': np.int32,
+    'runtimes': np.float64,
+    'lbs': np.float64,
+    'ubs': np.float64,
+}
+
 
 @dataclass
 class Result:
-    assignments: List[List[int]]
-    runtimes: List[float]
-    lbs: List[float]
-    ubs: List[float]
+    """
+    Result of a solution method. Results are stored as JSON, or in a binary,
+    columnar format: the assignments and traces as arrays, and the remaining
+    data in a small JSON header. Binary results are loaded lazily, so each
+    array is only read once it is used.
+    """
+    assignments: Union[List[List[int]], np.ndarray]
+    runtimes: Union[List[float], np.ndarray]
+    lbs: Union[List[float], np.ndarray]
+    ubs: Union[List[float], np.ndarray]
     objective: float
 
+    # Objectives and convergence traces of each run, when the result is the
+    # best of several parallel runs.
+    workers: Optional[List[dict]] = None
+
+    # Per-operator statistics: number of calls, runtime (in seconds), learners
+    # (un)assigned, and new best solutions found.
+    operators: Optional[Dict[str, dict]] = None
+
     @cached_property
     def solution(self) -> Solution:
         return Solution.from_assignments(self.assignments)
 
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, which for a binary
+        # result are the columns that have not yet been loaded.
+        if name in _COLUMNS and '_columns' in self.__dict__:
+            if name in self._columns:
+                value = self._columns[name]
+            else:  # upper bounds are not stored when they are all infinite.
+                value = np.full(len(self.lbs), np.inf)
+
+            setattr(self, name, value)
+            return value
+
+        raise AttributeError(name)
+
+    @staticmethod
+    def locate(loc: Union[str, Path]) -> Optional[Path]:
+        """
+        Returns the file of the result at the given location, in either
+        format, preferring the binary format. None if no such file exists.
+        """
+        for suffix in [".npz", ".json"]:
+            if (path := Path(loc).with_suffix(suffix)).exists():
+                return path
+
+        return None
+
+    @staticmethod
+    def exists(loc: Union[str, Path]) -> bool:
+        """
+        Tests if a result exists at the given location, in either format.
+        """
+        return Result.locate(loc) is not None
+
+    @classmethod
+    def from_file(cls, loc: Union[str, Path]) -> Result:
+        """
+        Reads the result at the given location. When a binary version of a
+        JSON result file exists (e.g. ``1-heuristic.npz`` for
+        ``1-heuristic.json``), the binary version is used.
+        """
+        binary_loc = Path(loc).with_suffix(".npz")
+
+        if binary_loc.exists():
+            return cls._from_binary(binary_loc)
+
+        return cls._from_json(Path(loc).with_suffix(".json"))
+
+    @classmethod
+    def _from_binary(cls, loc: Path) -> Result:
+        columns = np.load(loc)
+        header = json.loads(columns[_HEADER].item())
+
+        res = cls.__new__(cls)
+        res.__dict__.update(header, _columns=columns)
+
+        return res
+
     @classmethod
-    def from_file(cls, loc: str) -> Result:
+    def _from_json(cls, loc: Path) -> Result:
         with open(loc, "r") as fh:
             data = json.load(fh)
 
-        runtimes = data["runtimes"] if "runtimes" in data else data["run_times"]
+        runtimes = data["runtimes"] if "runtimes" in data \
+            else data["run_times"]
 
         return cls(data["assignments"],
                    runtimes,
                    data["lbs"],
                    data["ubs"],
-                   data["objective"])
+                   data["objective"],
+                   data.get("workers"),
+                   data.get("operators"))
+
+    def to_file(self, loc: Union[str, Path]):
+        """
+        Writes the result to the given location. Locations ending in ``.json``
+        are written as JSON; otherwise, the result is written in the binary
+        format, as a NumPy ``.npz`` archive.
+        """
+        # Writes to a temporary file first, and then replaces the target. That
+        # ensures an interrupted write never leaves a partial result file.
+        tmp_loc = f"{loc}.tmp"
+        data = {field.name: getattr(self, field.name)
+                for field in fields(self)}
+
+        if Path(loc).suffix == ".json":
+            with open(tmp_loc, "w") as fh:
+                json.dump({key: np.asarray(value).tolist()
+                           if key in _COLUMNS else value
+                           for key, value in data.items()}, fh)
+        else:
+            columns = {key: np.asarray(data.pop(key), dtype=dtype)
+                       for key, dtype in _COLUMNS.items()}
 
-    def to_file(self, loc: str):
-        with open(loc, "w") as fh:
-            json.dump(vars(self), fh)
+            columns['assignments'] = columns['assignments'].reshape(-1, 4)
+
+            if np.isinf(columns['ubs']).all():
+                del columns['ubs']
+
+            with open(tmp_loc, "wb") as fh:
+                np.savez(fh, **columns, **{_HEADER: json.dumps(data)})
+
+        os.replace(tmp_loc, loc)
 
     def measures(self) -> dict[str, ...]:
         return {
             "objective": self.objective,
             "bounds": [self.lbs[-1], self.ubs[-1]],
             "iterations": self.iterations(),
-            "run-time (wall)": sum(self.runtimes),
+            "run-time (wall)": float(np.sum(self.runtimes)),
             "instruction (# learners)": self.num_instruction(),
             "self-study (# learners)": self.num_self_study(),
             "activities (#)": self.num_activities(),
@@ -54,6 +168,32 @@ class Result:
             "gap (10 min)": self.gap(600),
         }
 
+    def operator_measures(self) -> List[dict]:
+        """
+        Returns measures of the time spent in, and the effectiveness of, each
+        operator. Empty if the result does not contain operator statistics.
+        """
+        if not self.operators:
+            return []
+
+        total = np.sum(self.runtimes)
+        measures = []
+
+        for name, stats in self.operators.items():
+            calls = max(stats["calls"], 1)
+
+            measures.append({
+                "operator": name,
+                "calls (#)": stats["calls"],
+                "run-time (s)": stats["runtime"],
+                "run-time (%)": 100 * stats["runtime"] / total,
+                "time per call (ms)": 1000 * stats["runtime"] / calls,
+                "learners per call (#)": stats["learners"] / calls,
+                "new best (#)": stats.get("best"),
+            })
+
+        return measures
+
     def gap(self, seconds: int):
         times = np.cumsum(self.runtimes)
         idx = np.searchsorted(times, seconds)
@@ -69,24 +209,41 @@ class Result:
     def objective(self):
         return self.objective
 
+    @cached_property
+    def _activities(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the module and number of learners of each activity, derived
+        directly from the assignments, so without the problem instance. As in
+        ``Solution.from_assignments``, activities are the unique (classroom,
+        teacher, module) triples, in order of first appearance.
+        """
+        assignments = np.asarray(self.assignments, dtype=int).reshape(-1, 4)
+
+        _, first, sizes = np.unique(assignments[:, [2, 3, 1]],
+                                    axis=0,
+                                    return_index=True,
+                                    return_counts=True)
+
+        order = np.argsort(first)
+        return assignments[first[order], 1], sizes[order]
+
     def num_activities(self):
-        return len(self.solution.activities)
+        _, sizes = self._activities
+        return len(sizes)
 
     def num_self_study(self):
-        return sum(a.num_learners for a in self.solution.activities
-                   if a.is_self_study())
+        return sum(self.self_study_sizes())
 
     def num_instruction(self):
-        return sum(a.num_learners for a in self.solution.activities
-                   if a.is_instruction())
+        return sum(self.instruction_sizes())
 
     def instruction_sizes(self):
-        return [a.num_learners for a in self.solution.activities
-                if a.is_instruction()]
+        modules, sizes = self._activities
+        return sizes[modules != SELF_STUDY_MODULE_ID].tolist()
 
     def self_study_sizes(self):
-        return [a.num_learners for a in self.solution.activities
-                if a.is_self_study()]
+        modules, sizes = self._activities
+        return sizes[modules == SELF_STUDY_MODULE_ID].tolist()
 
     def plot_convergence(self):
         x = np.cumsum(self.runtimes)
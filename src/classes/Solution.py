@@ -1,118 +1,262 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from copy import copy, deepcopy
-from heapq import heappush
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 
+import numpy as np
 from alns import State
 
 from .Activity import Activity
 from .Classroom import Classroom
 from .Learner import Learner
 from .Module import Module
+from .Problem import Problem
+from .ResourcePools import ResourcePools
 from .Teacher import Teacher
 
 
 class Solution(State):
-    activities: List[Activity]
-    unassigned: Set[Learner]
-
-    _used_classrooms: Set[Classroom]
-    _used_teachers: Set[Teacher]
-
-    def __init__(self, activities: List[Activity]):
-        self.activities = activities
-        self.unassigned = set()
-
-        self._used_classrooms = {activity.classroom for activity in activities}
-        self._used_teachers = {activity.teacher for activity in activities}
+    """
+    Solution state. The state is stored compactly, as NumPy arrays: one array
+    mapping each learner to the index of its activity (-1 if unassigned), and
+    per-activity arrays of module, classroom, teacher and size. Unused activity
+    slots have module -1. Since each activity needs a classroom of its own,
+    there are as many activity slots as there are classrooms.
+
+    Additionally, the learners of each activity are stored in the rows of a
+    members matrix, with each learner's position in that row. This allows
+    constant-time insertion and removal of learners, and direct access to an
+    activity's learners.
+
+    The objective is tracked incrementally, per activity and in total: each
+    learner move updates it by the preferences for the modules involved, so
+    evaluating the objective never requires a full scan.
+
+    The classrooms and teachers that are not used by any activity are tracked
+    in boolean masks, which are updated whenever resources are assigned or
+    released. For each of the static resource pools of the problem instance
+    (see ``Problem.classroom_pools`` and ``Problem.teacher_pools``), the
+    position of the first free resource in the pool is tracked as well. These
+    positions are lower bounds: resources that are assigned are only skipped
+    when the pool is next searched, whereas releasing a resource immediately
+    moves the position back in every pool that contains it. Since resources
+    are mostly taken from the front of their pools, finding a free, qualified
+    resource then rarely needs to look past more than a few resources.
+
+    Activities are exposed as light-weight views into these arrays, see also
+    ``Activity``.
+    """
+    _problem: Problem
+    _learner_activity: np.ndarray
+    _learner_position: np.ndarray
+
+    _modules: np.ndarray
+    _classrooms: np.ndarray
+    _teachers: np.ndarray
+    _sizes: np.ndarray
+    _members: np.ndarray
+    _objectives: np.ndarray
+
+    _classroom_free: np.ndarray
+    _teacher_free: np.ndarray
+    _classroom_first: List[int]
+    _teacher_first: List[int]
+
+    _num_unassigned: int
+    _objective: float
+
+    def __init__(self, problem: Problem):
+        num_slots = len(problem.classrooms)
+
+        self._problem = problem
+        self._learner_activity = np.full(problem.num_learners, -1, np.int32)
+        self._learner_position = np.full(problem.num_learners, -1, np.int32)
+
+        self._modules = np.full(num_slots, -1, np.int32)
+        self._classrooms = np.full(num_slots, -1, np.int32)
+        self._teachers = np.full(num_slots, -1, np.int32)
+        self._sizes = np.zeros(num_slots, np.int32)
+
+        max_size = max(classroom.capacity for classroom in problem.classrooms)
+        self._members = np.full((num_slots, max_size), -1, np.int32)
+
+        self._objectives = np.zeros(num_slots)
+
+        self._classroom_free = np.ones(len(problem.classrooms), dtype=bool)
+        self._teacher_free = np.ones(len(problem.teachers), dtype=bool)
+        self._classroom_first = [0] * len(problem.classroom_pools)
+        self._teacher_first = [0] * len(problem.teacher_pools)
+
+        self._num_unassigned = problem.num_learners
+        self._objective = 0.
 
     def __deepcopy__(self, memo={}):
-        # Not every part of a solution needs to be deep-copied - for the cached
-        # attributes a shallow copy suffices. For the activities, see also the
-        # motivation in Activity.
-        sol = Solution([])
-        sol.activities = deepcopy(self.activities)
-        sol._used_classrooms = copy(self._used_classrooms)
-        sol._used_teachers = copy(self._used_teachers)
+        # The solution consists entirely of (small) arrays, so copying these
+        # suffices.
+        sol = Solution.__new__(Solution)
+        sol.__dict__.update(self.__dict__)
+
+        sol._learner_activity = self._learner_activity.copy()
+        sol._learner_position = self._learner_position.copy()
+
+        sol._modules = self._modules.copy()
+        sol._classrooms = self._classrooms.copy()
+        sol._teachers = self._teachers.copy()
+        sol._sizes = self._sizes.copy()
+        sol._members = self._members.copy()
+        sol._objectives = self._objectives.copy()
+
+        sol._classroom_free = self._classroom_free.copy()
+        sol._teacher_free = self._teacher_free.copy()
+        sol._classroom_first = self._classroom_first.copy()
+        sol._teacher_first = self._teacher_first.copy()
 
         return sol
 
-    def add_activity(self, activity: Activity):
+    @property
+    def activities(self) -> List[Activity]:
+        return [Activity(self, idx)
+                for idx in np.flatnonzero(self._modules >= 0).tolist()]
+
+    def activity_of(self, learner: Learner) -> Optional[Activity]:
+        """
+        Returns the activity the passed-in learner is assigned to, or None if
+        the learner is unassigned.
+        """
+        idx = self._learner_activity[learner.id]
+        return Activity(self, int(idx)) if idx >= 0 else None
+
+    def learner_modules(self) -> np.ndarray:
+        """
+        Returns the module (ID) each learner is assigned to, or -1 for
+        unassigned learners.
+        """
+        return np.where(self._learner_activity >= 0,
+                        self._modules[self._learner_activity],
+                        -1)
+
+    @property
+    def unassigned(self) -> List[Learner]:
+        problem = self._problem
+
+        unassigned = np.flatnonzero(self._learner_activity < 0)
+        return [problem.learners[idx] for idx in unassigned.tolist()]
+
+    @property
+    def num_unassigned(self) -> int:
+        return self._num_unassigned
+
+    def add_activity(self,
+                     learners: List[Learner],
+                     classroom: Classroom,
+                     teacher: Teacher,
+                     module: Module) -> Activity:
         """
-        Adds the passed-in activity to the solution.
+        Adds an activity for the passed-in learners and resources to the
+        solution, and returns it. Learners that are currently assigned to
+        another activity are moved into the new activity.
         """
-        self.activities.append(activity)
+        idx = int(np.argmax(self._modules < 0))
+        assert self._modules[idx] < 0, "No free activity slots."
 
-        self._used_classrooms.add(activity.classroom)
-        self._used_teachers.add(activity.teacher)
+        self._modules[idx] = module.id
+        self._classrooms[idx] = classroom.id
+        self._teachers[idx] = teacher.id
+
+        self._classroom_free[classroom.id] = False
+        self._teacher_free[teacher.id] = False
+
+        for learner in learners:
+            self._move_learner(learner.id, idx)
+
+        return Activity(self, idx)
 
     def remove_activity(self, activity: Activity):
         """
-        Removes the passed-in activity from the solution. Raises ValueError if
-        activity is not in the solution.
+        Removes the passed-in activity from the solution. Its learners become
+        unassigned.
+        """
+        learner_ids = activity.learner_ids()
+
+        self._learner_activity[learner_ids] = -1
+        self._learner_position[learner_ids] = -1
+        self._sizes[activity.idx] = 0
+
+        self._num_unassigned += len(learner_ids)
+
+        self._objective -= self._objectives[activity.idx]
+        self._objectives[activity.idx] = 0.
+
+        self._release_classroom(self._classrooms[activity.idx])
+        self._release_teacher(self._teachers[activity.idx])
+
+        self._modules[activity.idx] = -1
+        self._classrooms[activity.idx] = -1
+        self._teachers[activity.idx] = -1
+
+    def switch_classrooms(self, activity: Activity, to_room: Classroom):
+        """
+        Moves the passed-in activity to the given classroom.
         """
-        self.activities.remove(activity)
-        self._used_classrooms.remove(activity.classroom)
-        self._used_teachers.remove(activity.teacher)
+        self._release_classroom(self._classrooms[activity.idx])
+        self._classroom_free[to_room.id] = False
 
-    def switch_classrooms(self, from_room: Classroom, to_room: Classroom):
+        self._classrooms[activity.idx] = to_room.id
+
+    def switch_module(self, activity: Activity, to_module: Module):
         """
-        Updates the solution's cache when a classroom switch is performed.
+        Switches the passed-in activity over to the given module.
         """
-        self._used_classrooms.remove(from_room)
-        self._used_classrooms.add(to_room)
+        prefs = self._problem.preferences
+        learner_ids = activity.learner_ids()
+
+        delta = prefs[learner_ids, to_module.id].sum()
+        delta -= prefs[learner_ids, self._modules[activity.idx]].sum()
+
+        self._modules[activity.idx] = to_module.id
+        self._objectives[activity.idx] += delta
+        self._objective += delta
 
     def find_classroom_for(self, module: Module) -> Classroom:
         """
         Finds a free classroom that can host the passed-in module. If none
         exist, this function raises a LookupError.
         """
-        from src.functions import get_problem
-        problem = get_problem()
-
-        avail_rooms = set(problem.classrooms_by_module[module])
-        avail_rooms -= self.used_classrooms()
+        problem = self._problem
+        classroom = _first_free(problem.classroom_pools,
+                                module,
+                                self._classroom_free,
+                                self._classroom_first)
 
-        for classroom in avail_rooms:
-            if classroom.is_qualified_for(module):
-                return classroom
+        if classroom < 0:
+            raise LookupError(f"No qualified, available classrooms for "
+                              f"{module}.")
 
-        raise LookupError(f"No qualified, available classrooms for {module}.")
+        return problem.classrooms[classroom]
 
     def find_teacher_for(self, module: Module) -> Teacher:
         """
-        Finds a teacher that can teach the passed-in module. If none exist, this
-        function raises a LookupError.
+        Finds a teacher that can teach the passed-in module. If none exist,
+        this function raises a LookupError. See ``Problem.teacher_pools`` for
+        the order in which teachers are selected.
         """
-        from src.functions import get_problem
-        problem = get_problem()
-
-        available_teachers = set(problem.teachers_by_module[module])
-        available_teachers -= self.used_teachers()
-
-        # We select the worst qualifying teacher - e.g. for a second degree
-        # module, we would first want to exhaust second degree teachers rather
-        # than first degree, because those can be used to teach first degree
-        # modules as well.
-        qualified_teachers = []
+        problem = self._problem
+        teacher = _first_free(problem.teacher_pools,
+                              module,
+                              self._teacher_free,
+                              self._teacher_first)
 
-        for teacher in available_teachers:
-            if teacher.is_qualified_for(module):
-                heappush(qualified_teachers,
-                         (-teacher.degree, teacher.id, teacher))
+        if teacher < 0:
+            raise LookupError(f"No qualified, available teachers for "
+                              f"{module}.")
 
-        if not qualified_teachers:
-            raise LookupError(f"No qualified, available teachers for {module}.")
-
-        return qualified_teachers[0][-1]
+        return problem.teachers[teacher]
 
     def objective(self) -> float:
         # The ALNS algorithm solves a minimisation objective by default, but
         # the problem is actually a maximisation problem, hence the trick with
         # the minus.
-        return -sum(activity.objective() for activity in self.activities)
+        return -self._objective
 
     def activities_by_module(self) -> Dict[Module, List[Activity]]:
         """
@@ -126,30 +270,43 @@ class Solution(State):
         return grouped
 
     def used_classrooms(self) -> Set[Classroom]:
-        return self._used_classrooms
+        problem = self._problem
+
+        used = np.flatnonzero(~self._classroom_free)
+        return {problem.classrooms[idx] for idx in used.tolist()}
 
     def used_teachers(self) -> Set[Teacher]:
-        return self._used_teachers
+        problem = self._problem
+
+        used = np.flatnonzero(~self._teacher_free)
+        return {problem.teachers[idx] for idx in used.tolist()}
 
     def get_assignments(self) -> List[List[int]]:
         """
         Returns a list of (learner, module, classroom, teacher) assignments.
         """
-        return [[learner.id,
-                 activity.module.id,
-                 activity.classroom.id,
-                 activity.teacher.id]
-                for activity in self.activities
-                for learner in activity.learners]
+        learner_ids = np.flatnonzero(self._learner_activity >= 0)
+        activities = self._learner_activity[learner_ids]
+
+        assignments = np.column_stack((learner_ids,
+                                       self._modules[activities],
+                                       self._classrooms[activities],
+                                       self._teachers[activities]))
+
+        return assignments.tolist()
 
     @classmethod
-    def from_assignments(cls, assignments: List[List[int]]) -> Solution:
+    def from_assignments(cls,
+                         assignments: List[List[int]],
+                         problem: Optional[Problem] = None) -> Solution:
         """
         Reconstructs a Solution object from a list of (learner, module,
-        classroom, teacher) assignments.
+        classroom, teacher) assignments. If no problem instance is given, the
+        global problem instance is used.
         """
-        from src.functions import get_problem
-        problem = get_problem()
+        if problem is None:
+            from src.functions import get_problem
+            problem = get_problem()
 
         resources = defaultdict(list)
 
@@ -157,14 +314,99 @@ class Solution(State):
             learner = problem.learners[learner]
             resources[classroom, teacher, module].append(learner)
 
-        solution = cls([])
+        solution = cls(problem)
 
         for (classroom, teacher, module), learners in resources.items():
             classroom = problem.classrooms[classroom]
             teacher = problem.teachers[teacher]
             module = problem.modules[module]
 
-            activity = Activity(learners, classroom, teacher, module)
-            solution.add_activity(activity)
+            solution.add_activity(learners, classroom, teacher, module)
 
         return solution
+
+    def _move_learner(self, learner_id: int, idx: int):
+        """
+        Moves the given learner to the activity at index idx, or to the
+        unassigned learners if idx is -1.
+        """
+        prefs = self._problem.preferences
+        curr_idx = self._learner_activity[learner_id]
+
+        if curr_idx >= 0:
+            # Removes the learner from its current activity, by moving the
+            # last member of that activity into the learner's position.
+            pos = self._learner_position[learner_id]
+            last = self._sizes[curr_idx] - 1
+            last_id = self._members[curr_idx, last]
+
+            self._members[curr_idx, pos] = last_id
+            self._learner_position[last_id] = pos
+            self._sizes[curr_idx] = last
+
+            pref = prefs[learner_id, self._modules[curr_idx]]
+            self._objectives[curr_idx] -= pref
+            self._objective -= pref
+        else:
+            self._num_unassigned -= 1
+
+        if idx >= 0:
+            pos = self._sizes[idx]
+
+            self._members[idx, pos] = learner_id
+            self._sizes[idx] = pos + 1
+
+            self._learner_position[learner_id] = pos
+
+            pref = prefs[learner_id, self._modules[idx]]
+            self._objectives[idx] += pref
+            self._objective += pref
+        else:
+            self._learner_position[learner_id] = -1
+            self._num_unassigned += 1
+
+        self._learner_activity[learner_id] = idx
+
+    def _release_classroom(self, classroom_id: int):
+        self._classroom_free[classroom_id] = True
+        _release(self._problem.classroom_pools,
+                 classroom_id,
+                 self._classroom_first)
+
+    def _release_teacher(self, teacher_id: int):
+        self._teacher_free[teacher_id] = True
+        _release(self._problem.teacher_pools,
+                 teacher_id,
+                 self._teacher_first)
+
+
+def _first_free(pools: ResourcePools,
+                module: Module,
+                free: np.ndarray,
+                first: List[int]) -> int:
+    """
+    Returns the first free resource in the module's pool, or -1 if all
+    resources in the pool are in use. Resources before the pool's first free
+    position are not free, so the search starts there. The position is then
+    updated to that of the returned resource.
+    """
+    pool_idx = pools.pool_of[module]
+    pool = pools.pools[pool_idx]
+    pos = first[pool_idx]
+    size = len(pool)
+
+    while pos < size and not free[pool[pos]]:
+        pos += 1
+
+    first[pool_idx] = pos
+    return pool[pos] if pos < size else -1
+
+
+def _release(pools: ResourcePools, resource: int, first: List[int]):
+    """
+    Moves the first free position of each pool that contains the released
+    resource back to the resource's position, if it comes earlier.
+    """
+    for pool_idx, pos in pools.memberships[resource]:
+        if pos < first[pool_idx]:
+            first[pool_idx] = pos
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+from scipy import sparse
+
+_INTEGER = (int, np.integer)
+
+
+class SparsePreferences:
+    """
+    Sparse learner preferences. The preferences for the regular modules are
+    stored as a CSR matrix of learners (rows) to modules (columns), and the
+    self-study preferences as a dense vector - the self-study preference is
+    the only one that is nonzero for every learner.
+
+    Supports the same ``preferences[learner_ids, module_ids]`` element lookups
+    as the dense preference matrix, where the last module (column) is the
+    self-study module.
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, self_study: np.ndarray):
+        matrix = sparse.csr_matrix(matrix)
+        matrix.sum_duplicates()  # also sorts the indices within each row
+
+        self.matrix = matrix
+        self.self_study = np.asarray(self_study, dtype=float)
+
+        # Flat (row-major) position of each nonzero in the matrix. Since the
+        # CSR indices are sorted, this array is sorted as well, which allows
+        # vectorised lookups using binary search.
+        num_rows, num_cols = matrix.shape
+        rows = np.repeat(np.arange(num_rows), np.diff(matrix.indptr))
+
+        self._keys = rows * num_cols + matrix.indices
+        self._num_cols = num_cols
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        num_rows, num_cols = self.matrix.shape
+        return num_rows, num_cols + 1
+
+    @property
+    def nbytes(self) -> int:
+        return (self.matrix.data.nbytes
+                + self.matrix.indices.nbytes
+                + self.matrix.indptr.nbytes
+                + self.self_study.nbytes
+                + self._keys.nbytes)
+
+    def row(self, learner_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the modules (IDs) the given learner holds a nonzero preference
+        for, and the associated preferences. Excludes the self-study module.
+        """
+        start, end = self.matrix.indptr[learner_id:learner_id + 2]
+        return self.matrix.indices[start:end], self.matrix.data[start:end]
+
+    def toarray(self) -> np.ndarray:
+        return np.concatenate((self.matrix.toarray(),
+                               self.self_study[:, None]), 1)
+
+    def __getitem__(self, key):
+        rows, cols = key
+
+        # Single element lookups are by far the most common, and are kept as
+        # cheap as possible.
+        if isinstance(rows, _INTEGER) and isinstance(cols, _INTEGER):
+            return self._lookup(rows, cols)
+
+        rows, cols = np.broadcast_arrays(np.asarray(rows), np.asarray(cols))
+        cols = np.where(cols < 0, cols + self.shape[1], cols)
+
+        num_cols = self._num_cols
+        is_self_study = cols == num_cols
+
+        keys = rows * num_cols + cols
+        pos = np.searchsorted(self._keys, keys)
+        pos = np.minimum(pos, len(self._keys) - 1)
+
+        found = (self._keys[pos] == keys) & ~is_self_study
+        prefs = np.where(found, self.matrix.data[pos], 0.)
+        prefs[is_self_study] = self.self_study[rows[is_self_study]]
+
+        return prefs
+
+    def _lookup(self, row: int, col: int) -> float:
+        num_cols = self._num_cols
+
+        if col < 0:
+            col += num_cols + 1
+
+        if col == num_cols:
+            return self.self_study[row]
+
+        key = row * num_cols + col
+        pos = self._keys.searchsorted(key)
+
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return self.matrix.data[pos]
+
+        return 0.
@@ -1,8 +1,12 @@
 from .Activity import Activity
 from .Classroom import Classroom
+from .InPlaceALNS import InPlaceALNS, SearchState
 from .Learner import Learner
 from .Module import Module
+from .OperatorStatistics import OperatorStatistics
 from .Problem import Problem
+from .ResourcePools import ResourcePools
 from .Result import Result
 from .Solution import Solution
+from .SparsePreferences import SparsePreferences
 from .Teacher import Teacher
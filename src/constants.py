@@ -13,6 +13,11 @@ DEGREE_OF_DESTRUCTION = 0.15
 MAX_WORSE = 0.05
 ACCEPT_PROB = 0.5
 
+# Limits on the number of passes and runtime (in seconds) of the
+# reinsert_learner local search. None means no limit.
+REINSERT_MAX_PASSES = None
+REINSERT_MAX_RUNTIME = None
+
 
 def get_criterion(init_obj: float, stop: MaxIterations) -> SimulatedAnnealing:
     return SimulatedAnnealing.autofit(-init_obj,
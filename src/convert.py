@@ -0,0 +1,45 @@
+import argparse
+from pathlib import Path
+
+from src.batch import experiments
+from src.classes import Problem, Result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="convert",
+                                     description="Converts experiment data "
+                                                 "and result files from "
+                                                 "JSON to the binary "
+                                                 "formats.")
+
+    parser.add_argument("experiments", nargs="+",
+                        help="Experiments to convert. Ranges of experiments "
+                             "may be given as, e.g., 1-72.")
+
+    return parser, parser.parse_args()
+
+
+def main():
+    parser, args = parse_args()
+
+    for experiment in experiments(args.experiments):
+        for loc in sorted(Path(f"experiments/{experiment}").glob("*.json")):
+            instance, _, method = loc.stem.partition("-")
+
+            if not instance.isdigit():
+                continue
+
+            # Always reads the JSON file, so that an existing binary version
+            # is refreshed.
+            if not method:
+                problem = Problem._from_json(str(loc))
+                problem.to_file(str(loc.with_suffix("")))
+            else:  # result file, e.g. 1-heuristic.json.
+                result = Result._from_json(loc)
+                result.to_file(loc.with_suffix(".npz"))
+
+            print(f"{parser.prog}: converted {loc}.")
+
+
+if __name__ == "__main__":
+    main()
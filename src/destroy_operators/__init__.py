@@ -3,6 +3,8 @@ from .random_learners import random_learners
 from .smallest_activities import smallest_activities
 from .regret_learners import regret_learners
 
+# Destroy operators modify the passed-in solution in place, and return it. See
+# also InPlaceALNS.
 DESTROY_OPERATORS = [
     random_activities,
     random_learners,
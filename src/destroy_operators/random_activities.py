@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from numpy.random import Generator
 
 from src.classes import Problem, Solution
@@ -13,13 +11,10 @@ def random_activities(current: Solution,
     Randomly removes whole activities from the solution, until at least q
     learners have been removed.
     """
-    destroyed = deepcopy(current)
-
-    while len(destroyed.unassigned) < learners_to_remove():
-        idx = generator.integers(len(destroyed.activities))
-        activity = destroyed.activities[idx]
+    activities = current.activities
 
-        destroyed.unassigned |= set(activity.learners)
-        destroyed.remove_activity(activity)
+    while current.num_unassigned < learners_to_remove(problem):
+        idx = generator.integers(len(activities))
+        current.remove_activity(activities.pop(idx))
 
-    return destroyed
+    return current
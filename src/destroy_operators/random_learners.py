@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from numpy.random import Generator
 
 from src.classes import Problem, Solution
@@ -16,27 +14,24 @@ def random_learners(current: Solution,
     activity is selected. The procedure continues until q learners have been
     removed, or no more can be removed.
     """
-    destroyed = deepcopy(current)
-
-    activities = [activity for activity in destroyed.activities
+    activities = [activity for activity in current.activities
                   if activity.num_learners > problem.min_batch]
 
-    while len(destroyed.unassigned) < learners_to_remove():
+    while current.num_unassigned < learners_to_remove(problem):
         if len(activities) == 0:  # cannot remove more learners, so we return
-            return destroyed      # and hope we have unassigned enough
+            return current        # and hope we have unassigned enough
 
         a_frac, l_frac = generator.random(size=2)
 
         activity_idx = int(a_frac * len(activities))
         activity = activities[activity_idx]
 
-        learner_idx = int(l_frac * len(activity.learners))
-        learner = activity.learners[learner_idx]
+        learner_ids = activity.learner_ids()
+        learner_id = learner_ids[int(l_frac * len(learner_ids))]
 
-        activity.remove_learner(learner)
-        destroyed.unassigned.add(learner)
+        activity.remove_learner(problem.learners[learner_id])
 
         if activity.num_learners == problem.min_batch:
             activities.remove(activity)
 
-    return destroyed
+    return current
@@ -1,4 +1,4 @@
-from copy import deepcopy
+from functools import lru_cache
 
 import numpy as np
 from numpy.random import Generator
@@ -15,39 +15,28 @@ def regret_learners(current: Solution,
     and current assignments. Using a skewed distribution, q of the worst cost
     learners are randomly selected and removed from the solution.
     """
-    destroyed = deepcopy(current)
-    regrets = np.zeros(problem.num_learners)
+    learner_ids = np.arange(problem.num_learners)
+    best_module_ids = problem.most_preferred[:, 0]
+    curr_module_ids = current.learner_modules()
 
-    assigned_activities = {}
-
-    for activity in destroyed.activities:
-        for learner in activity.learners:
-            assigned_activities[learner.id] = activity
-
-        learner_ids = activity.learner_ids()
-
-        # The regret is the cost of the best assignment for this learner, minus
-        # the cost of the current assignment. The larger the regret, the more
-        # suboptimal the current assignment.
-        best_module_id = problem.most_preferred[learner_ids, 0]
-        curr_module_id = activity.module.id
-
-        regrets[learner_ids] = problem.preferences[learner_ids, best_module_id]
-        regrets[learner_ids] -= problem.preferences[learner_ids, curr_module_id]
+    # The regret is the cost of the best assignment for this learner, minus
+    # the cost of the current assignment. The larger the regret, the more
+    # suboptimal the current assignment.
+    regrets = problem.preferences[learner_ids, best_module_ids]
+    regrets -= problem.preferences[learner_ids, curr_module_ids]
+    regrets[curr_module_ids < 0] = 0
 
     learners = np.argsort(regrets)
     learners = learners[-_rnd_select(generator, problem) - 1]
 
     for learner_id in learners:
-        activity = assigned_activities[learner_id]
-
-        if activity.num_learners > problem.min_batch:
-            learner = problem.learners[learner_id]
+        learner = problem.learners[learner_id]
+        activity = current.activity_of(learner)
 
-            destroyed.unassigned.add(learner)
+        if activity is not None and activity.num_learners > problem.min_batch:
             activity.remove_learner(learner)
 
-    return destroyed
+    return current
 
 
 def _rnd_select(generator: Generator, problem: Problem):
@@ -56,13 +45,19 @@ def _rnd_select(generator: Generator, problem: Problem):
     a certain list of num_learners length (e.g., for a cost computation),
     favouring smaller indices.
     """
-    triangle = np.arange(learners_to_remove(), 0, -1)
-
-    probabilities = np.ones(problem.num_learners)
-    probabilities[:learners_to_remove()] = triangle
-    probabilities = probabilities / np.sum(probabilities)
+    num_remove = learners_to_remove(problem)
+    probabilities = _probabilities(problem.num_learners, num_remove)
 
     return generator.choice(problem.num_learners,
-                            learners_to_remove(),
+                            num_remove,
                             replace=False,
                             p=probabilities)
+
+
+@lru_cache(1)
+def _probabilities(num_learners: int, num_to_remove: int) -> np.ndarray:
+    triangle = np.arange(num_to_remove, 0, -1)
+
+    probabilities = np.ones(num_learners)
+    probabilities[:num_to_remove] = triangle
+    return probabilities / np.sum(probabilities)
@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 import numpy as np
 from numpy.random import Generator
 
@@ -13,18 +11,17 @@ def smallest_activities(current: Solution,
     """
     Removes activities that consist of the smallest number of learners.
     """
-    destroyed = deepcopy(current)
+    activities = current.activities
 
-    indices = np.argsort([a.num_learners for a in destroyed.activities])
-    activities = [destroyed.activities[idx] for idx in indices]
+    indices = np.argsort([a.num_learners for a in activities])
+    activities = [activities[idx] for idx in indices]
 
     for activity in activities:
         # TODO add randomness?
 
-        if len(destroyed.unassigned) >= learners_to_remove():
+        if current.num_unassigned >= learners_to_remove(problem):
             break
 
-        destroyed.unassigned |= set(activity.learners)
-        destroyed.remove_activity(activity)
+        current.remove_activity(activity)
 
-    return destroyed
+    return current
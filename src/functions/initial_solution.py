@@ -1,17 +1,15 @@
 from itertools import zip_longest
 
-from src.classes import Activity, Solution
+from src.classes import Problem, Solution
 
 
-def initial_solution() -> Solution:
+def initial_solution(problem: Problem) -> Solution:
     """
     Constructs an initial solution, where all learners are in self-study
     activities, in appropriate classrooms (and with some random teacher
     assigned to supervise).
     """
-    from src.functions import get_problem
-    problem = get_problem()
-    solution = Solution([])
+    solution = Solution(problem)
 
     # Not all classrooms are suitable for self-study. Such a restriction does,
     # however, not apply to teachers.
@@ -27,12 +25,10 @@ def initial_solution() -> Solution:
         learners = learners_to_assign[-min(len(learners_to_assign),
                                            classroom.capacity):]
 
-        activity = Activity(learners,
-                            classroom,
-                            teacher,
-                            problem.self_study_module)
-
-        solution.add_activity(activity)
+        activity = solution.add_activity(learners,
+                                         classroom,
+                                         teacher,
+                                         problem.self_study_module)
 
         learners_to_assign = learners_to_assign[:-activity.num_learners]
 
@@ -1,10 +1,8 @@
-from functools import lru_cache
+from src import constants
+from src.classes import Problem
 
-from src.constants import DEGREE_OF_DESTRUCTION
-from .problem import get_problem
 
-
-@lru_cache(1)
-def learners_to_remove() -> int:
-    problem = get_problem()
-    return int(DEGREE_OF_DESTRUCTION * problem.num_learners)
+def learners_to_remove(problem: Problem) -> int:
+    # The degree of destruction is looked up at call time, since tuning
+    # changes it between runs.
+    return int(constants.DEGREE_OF_DESTRUCTION * problem.num_learners)
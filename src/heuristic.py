@@ -1,14 +1,22 @@
 import argparse
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
 
 import numpy as np
 import numpy.random as rnd
-from alns import ALNS
+from alns.stop import MaxIterations, MaxRuntime
 from alns.weights import SimpleWeights
 
-from src.classes import Problem, Result
+from src.classes import (InPlaceALNS, OperatorStatistics, Problem, Result,
+                         SearchState)
 from src.constants import DECAY, STOP, WEIGHTS, get_criterion
 from src.destroy_operators import DESTROY_OPERATORS
-from src.functions import initial_solution, set_problem
+from src.functions import initial_solution
 from src.local_search import reinsert_learner
 from src.repair_operators import REPAIR_OPERATORS
 
@@ -19,65 +27,317 @@ def parse_args():
     parser.add_argument("experiment", type=str)
     parser.add_argument("instance", type=int)
     parser.add_argument("--exclude", type=str, default=None)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of independent ALNS runs to perform in "
+                             "parallel. The best result is kept.")
+    parser.add_argument("--sparse", action="store_true",
+                        help="Store the learner preferences sparsely. This "
+                             "uses much less memory on large instances.")
+
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="Stop the search after this many seconds, "
+                             "rather than after a fixed number of "
+                             "iterations.")
+    parser.add_argument("--checkpoint-interval", type=float, default=None,
+                        help="Write the best result found so far every this "
+                             "many seconds.")
+    parser.add_argument("--checkpoint-on-best", action="store_true",
+                        help="Write the best result whenever a new best "
+                             "solution is found.")
+
+    parser.add_argument("--iterations", type=int, default=None,
+                        help="Number of iterations to perform. When resuming, "
+                             "this includes the iterations performed before.")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Write a snapshot of the search state at every "
+                             "checkpoint, and when the run ends.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume the search from the last snapshot.")
 
     args = parser.parse_args()
+
+    if args.workers > 1 and (args.checkpoint_interval is not None
+                             or args.checkpoint_on_best
+                             or args.snapshot
+                             or args.resume):
+        parser.error("checkpoints and snapshots are not supported with "
+                     "multiple workers.")
+
+    if args.iterations is not None and args.iterations < 1:
+        parser.error("the number of iterations must be at least one.")
+
     args.experiment = "tuning" if args.experiment == "tuning" else int(args.experiment)
 
     return args
 
 
-def run_alns(experiment, instance, exclude, problem) -> Result:
+def get_seed(experiment, instance) -> int:
     if experiment == "tuning":
-        generator = rnd.default_rng(instance)
-    else:
-        # E.g. for exp 72 and inst. 1, this becomes 7201. This way, even for
-        # inst. 100, there will never be overlap between random number streams
-        # across experiments.
-        generator = rnd.default_rng(100 * experiment + instance)
+        return instance
+
+    # E.g. for exp 72 and inst. 1, this becomes 7201. This way, even for
+    # inst. 100, there will never be overlap between random number streams
+    # across experiments.
+    return 100 * experiment + instance
+
+
+@dataclass
+class Checkpoint:
+    """
+    Where and when to write the best result found so far, during a run. The
+    result is written every ``interval`` seconds, and/or whenever a new best
+    solution is found if ``on_best`` is set. If a snapshot location is given,
+    a snapshot of the search state is written as well, also when the run ends.
+
+    The location should differ from that of the final result, so that the
+    result of an interrupted run is never mistaken for a finished one.
+    """
+    loc: str
+    interval: Optional[float] = None
+    on_best: bool = False
+    snapshot_loc: Optional[str] = None
+
+
+def run_alns(seed,
+             exclude,
+             problem,
+             time_limit: Optional[float] = None,
+             checkpoint: Optional[Checkpoint] = None,
+             iterations: Optional[int] = None,
+             resume: Optional[str] = None) -> Result:
+    """
+    Runs the ALNS heuristic. By default, the search runs for the number of
+    iterations of ``STOP`` - this is changed by ``iterations``, or replaced by
+    a wall-clock ``time_limit``. When ``resume`` is given, the search continues
+    from the snapshot at that location, rather than starting anew.
+
+    Raises a ValueError when fewer than one iteration is requested.
+    """
+    if iterations is not None and iterations < 1:
+        raise ValueError(f"Expected at least one iteration; got {iterations}.")
+
+    generator = rnd.default_rng(seed)
+    alns = InPlaceALNS(generator)
 
-    alns = ALNS(generator)  # noqa
+    if resume is not None:
+        state, op_stats = load_snapshot(resume, problem)
+    else:
+        state, op_stats = None, OperatorStatistics()
 
     for operator in DESTROY_OPERATORS:
         if exclude != operator.__name__:
-            alns.add_destroy_operator(operator)
+            alns.add_destroy_operator(op_stats.instrument(operator))
 
     for operator in REPAIR_OPERATORS:
         if exclude != operator.__name__:
-            alns.add_repair_operator(operator)
+            alns.add_repair_operator(op_stats.instrument(operator))
 
     if exclude != "reinsert_learner":
-        alns.on_best(reinsert_learner)
+        alns.on_best(op_stats.instrument(reinsert_learner))
+
+    if checkpoint is not None:
+        def write(search_state: SearchState):
+            res = _to_result(search_state.best, search_state.stats, op_stats)
+            res.to_file(checkpoint.loc)
+
+            if checkpoint.snapshot_loc is not None:
+                save_snapshot(checkpoint.snapshot_loc, search_state, op_stats)
+
+        alns.on_checkpoint(write, checkpoint.interval, checkpoint.on_best)
+
+    if state is None:
+        # Stopping criteria are stateful, so each run gets its own copy.
+        if iterations is not None:
+            stop = MaxIterations(iterations)
+        else:
+            stop = deepcopy(STOP)
+
+        init = initial_solution(problem)
+        criterion = get_criterion(init.objective(), stop)
+        weights = SimpleWeights(WEIGHTS,
+                                len(alns.destroy_operators),
+                                len(alns.repair_operators),
+                                DECAY)
+
+        if time_limit is not None:
+            # The temperature schedule of the acceptance criterion is still
+            # based on the number of iterations.
+            stop = MaxRuntime(time_limit)
+
+        res = alns.iterate(init, weights, criterion, stop, problem=problem)
+    else:
+        # A resumed search may be given a new stopping criterion, e.g. to
+        # extend a completed run. Iterations count from the start of the run,
+        # whereas the time limit applies to the resumed part only.
+        if iterations is not None:
+            state.stop = MaxIterations(iterations)
+            state.stop._current_iteration = len(state.stats.objectives) - 1
+
+        if time_limit is not None:
+            state.stop = MaxRuntime(time_limit)
+
+        res = alns.resume(state, problem=problem)
+
+    return _to_result(res.best_state, res.statistics, op_stats)
+
+
+def solve(problem: Problem, budget: int, seed: int) -> Result:
+    """
+    Solves the given problem instance with the heuristic, for ``budget``
+    iterations, using the given seed. The problem instance is passed to
+    everything that needs it, so several instances may be solved in the same
+    process, also concurrently from different threads.
+    """
+    return run_alns(seed, None, problem, iterations=budget)
 
-    init = initial_solution()
-    criterion = get_criterion(init.objective(), STOP)
-    weights = SimpleWeights(WEIGHTS,
-                            len(alns.destroy_operators),
-                            len(alns.repair_operators),
-                            DECAY)
 
-    res = alns.iterate(init, weights, criterion, STOP, problem=problem)
-    lbs = -np.minimum.accumulate(res.statistics.objectives[1:])
+def save_snapshot(loc: str, state: SearchState, op_stats: OperatorStatistics):
+    """
+    Writes a snapshot of the search state and operator statistics to the given
+    location. Like results, snapshots are replaced atomically.
+    """
+    tmp_loc = f"{loc}.tmp"
+
+    with open(tmp_loc, "wb") as fh:
+        pickler = _SnapshotPickler(fh, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.dump((state, op_stats))
+
+    os.replace(tmp_loc, loc)
+
+
+def load_snapshot(loc: str,
+                  problem: Problem) -> Tuple[SearchState, OperatorStatistics]:
+    """
+    Reads a snapshot written by ``save_snapshot``. The solutions in the
+    snapshot are attached to the given problem instance.
+    """
+    with open(loc, "rb") as fh:
+        return _SnapshotUnpickler(fh, problem).load()
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """
+    Snapshots do not store the problem instance, only a reference to it. The
+    instance is passed in again when the snapshot is loaded.
+    """
+
+    def persistent_id(self, obj):
+        return "problem" if isinstance(obj, Problem) else None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+
+    def __init__(self, fh, problem: Problem):
+        super().__init__(fh)
+        self._problem = problem
+
+    def persistent_load(self, pid):
+        if pid != "problem":
+            raise pickle.UnpicklingError(f"Unknown persistent ID {pid}.")
+
+        return self._problem
+
+
+def _to_result(best, statistics, op_stats: OperatorStatistics) -> Result:
+    lbs = -np.minimum.accumulate(statistics.objectives[1:])
     ubs = [float("inf")] * len(lbs)
 
-    return Result(res.best_state.get_assignments(),  # noqa
-                  res.statistics.runtimes.tolist(),  # noqa
+    # The number of new best solutions found is already tracked by the ALNS
+    # statistics, as the first outcome count of each operator.
+    operators = op_stats.to_dict()
+    counts = {**statistics.destroy_operator_counts,
+              **statistics.repair_operator_counts}
+
+    for name, outcomes in counts.items():
+        operators[name]["best"] = int(outcomes[0])
+
+    return Result(best.get_assignments(),
+                  statistics.runtimes.tolist(),  # noqa
                   lbs.tolist(),
                   ubs,
-                  -res.best_state.objective())
+                  -best.objective(),
+                  operators=operators)
+
+
+def run_workers(seed,
+                exclude,
+                problem,
+                workers,
+                time_limit: Optional[float] = None,
+                iterations: Optional[int] = None) -> List[Result]:
+    """
+    Performs independent ALNS runs in a pool of worker processes. Each worker
+    receives its own random number stream, spawned from the given seed.
+
+    The problem instance is passed along with each run, so this works the same
+    whether worker processes are forked or spawned (the default on macOS and
+    Windows).
+    """
+    seeds = rnd.SeedSequence(seed).spawn(workers)
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(run_alns,
+                                   seed,
+                                   exclude,
+                                   problem,
+                                   time_limit,
+                                   iterations=iterations)
+                   for seed in seeds]
+
+        return [future.result() for future in futures]
 
 
 def main():
     args = parse_args()
 
     data_loc = f"experiments/{args.experiment}/{args.instance}.json"
-    res_loc = f"experiments/{args.experiment}/{args.instance}-heuristic.json"
+    res_loc = f"experiments/{args.experiment}/{args.instance}-heuristic.npz"
+    checkpoint_loc = f"experiments/{args.experiment}/{args.instance}" \
+                     f"-heuristic.checkpoint.npz"
+    snapshot_loc = f"experiments/{args.experiment}/{args.instance}" \
+                   f"-heuristic.state"
 
-    problem = Problem.from_file(data_loc)
-    set_problem(problem)
+    problem = Problem.from_file(data_loc, sparse=args.sparse)
+
+    seed = get_seed(args.experiment, args.instance)
+
+    if args.workers > 1:
+        results = run_workers(seed,
+                              args.exclude,
+                              problem,
+                              args.workers,
+                              args.time_limit,
+                              args.iterations)
+
+        res = max(results, key=lambda result: result.objective)
+        res.workers = [dict(objective=result.objective,
+                            runtimes=result.runtimes,
+                            lbs=result.lbs)
+                       for result in results]
+    else:
+        checkpoint = None
+
+        if args.checkpoint_interval is not None \
+                or args.checkpoint_on_best \
+                or args.snapshot:
+            checkpoint = Checkpoint(checkpoint_loc,
+                                    args.checkpoint_interval,
+                                    args.checkpoint_on_best,
+                                    snapshot_loc if args.snapshot else None)
+
+        res = run_alns(seed,
+                       args.exclude,
+                       problem,
+                       args.time_limit,
+                       checkpoint,
+                       args.iterations,
+                       snapshot_loc if args.resume else None)
 
-    res = run_alns(**vars(args), problem=problem)
     res.to_file(res_loc)
 
+    # The run is finished, so its checkpoint is superseded by the result.
+    Path(checkpoint_loc).unlink(missing_ok=True)
+
     print(res)
 
 
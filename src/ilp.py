@@ -1,21 +1,216 @@
 import argparse
+import time
 from collections import defaultdict
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
 
 import numpy as np
-from gurobipy import GRB, MVar, Model
+from scipy.sparse import coo_matrix, csr_matrix
 
-from src.classes import Problem, Result
+from src.classes import Classroom, Problem, Result, Teacher
 from src.constants import SELF_STUDY_MODULE_ID
 from src.functions import get_problem, set_problem
 
+# Solution value, and cumulative run-times, lower bounds, and upper bounds
+# during the search.
+_Solve = Tuple[np.ndarray, List[float], List[float], List[float]]
 
-def ilp() -> Result:
+
+@dataclass
+class Formulation:
+    """
+    Solver-independent formulation of the ILP, as a maximisation problem
+    ``max obj @ v`` subject to ``A @ v (sense) rhs``, and ``lb <= v <= ub``,
+    with integer ``v``. The variables are the resource counts (one per row of
+    ``keys``), followed by the learner assignments (one per row of
+    ``learner_modules``).
+    """
+    keys: np.ndarray  # module, classroom class, and teacher class
+    classrooms: List[List[Classroom]]
+    teachers: List[List[Teacher]]
+    learner_modules: np.ndarray  # learner, and module
+
+    obj: np.ndarray
+    lb: np.ndarray
+    ub: np.ndarray
+    A: csr_matrix
+    sense: np.ndarray  # one of '<', '>', or '=', per constraint
+    rhs: np.ndarray
+
+    @property
+    def num_resource_vars(self) -> int:
+        return len(self.keys)
+
+
+def ilp(compact: bool = False, solver: str = "gurobi") -> Result:
     """
     Solves the integer linear programming (ILP) formulation of the hourly
-    learner preference problem.
+    learner preference problem. When ``compact`` is set, the compact
+    formulation is solved instead, see ``make_formulation``. The formulation
+    is solved with either Gurobi ('gurobi') or HiGHS ('highs').
     """
-    m, x, y = _make_model()
+    problem = get_problem()
+    formulation = make_formulation(problem, compact)
+
+    values, runtimes, lower_bounds, upper_bounds = SOLVERS[solver](formulation)
+
+    resources = _expand(formulation, values)
+    assignments = _to_assignments(problem, resources, _learner_modules(
+        problem, formulation, values))
+
+    runtimes = np.diff(runtimes, prepend=0).tolist()
+
+    return Result(assignments,
+                  runtimes,
+                  lower_bounds,
+                  upper_bounds,
+                  lower_bounds[-1])
+
+
+def make_formulation(problem: Problem, compact: bool = False) -> Formulation:
+    """
+    Makes the ILP formulation. The formulation assigns resources to modules,
+    and learners to modules. Resources are assigned as (classroom, teacher)
+    pairs, by class: all resources in a class are interchangeable. In the
+    regular formulation, each resource is a class of its own, so the counts
+    are binary. In the compact formulation, classrooms of the same room type
+    and capacity, and teachers of the same degree and module range, form a
+    class. Then the counts are integer, and the model is much smaller.
+
+    Either way, variables are only created for eligible combinations: those
+    with qualified resources, and positive learner preferences.
+    """
+    classrooms = _classroom_classes(problem, compact)
+    teachers = _teacher_classes(problem, compact)
+
+    modules = problem.modules
+    module_ids = np.array([module.id for module in modules])
+    is_self_study = module_ids == SELF_STUDY_MODULE_ID
+
+    # Qualification of each classroom class for each module, as in
+    # Classroom.is_qualified_for.
+    c_rep = [c_class[0] for c_class in classrooms]
+    c_room_type = np.array([classroom.room_type for classroom in c_rep])
+    c_self_study = np.array([classroom.self_study_allowed
+                             for classroom in c_rep])
+    c_capacity = np.array([classroom.capacity for classroom in c_rep])
+    c_size = np.array([len(c_class) for c_class in classrooms])
+
+    m_room_type = np.array([module.room_type for module in modules])
+    c_qualified = np.where(is_self_study[:, None],
+                           c_self_study[None, :],
+                           m_room_type[:, None] == c_room_type[None, :])
+
+    # Qualification of each teacher class for each module, as in
+    # Teacher.is_qualified_for.
+    t_rep = [t_class[0] for t_class in teachers]
+    t_degree = np.array([teacher.degree for teacher in t_rep])
+    t_frm = np.array([teacher.frm_module for teacher in t_rep])
+    t_to = np.array([teacher.to_module for teacher in t_rep])
+    t_size = np.array([len(t_class) for t_class in teachers])
+
+    m_qualification = np.array([module.qualification for module in modules])
+    t_qualified = is_self_study[:, None] \
+        | ((t_degree[None, :] <= m_qualification[:, None])
+           & (t_frm[None, :] <= module_ids[:, None])
+           & (module_ids[:, None] < t_to[None, :]))
+
+    eligible = c_qualified[:, :, None] & t_qualified[:, None, :]
+    keys = np.column_stack(np.nonzero(eligible))
+    k_module, k_classroom, k_teacher = keys.T
+
+    preferences = np.asarray(problem.preferences)
+    learner_modules = np.column_stack(np.nonzero(preferences > 0))
+    y_learner, y_module = learner_modules.T
+
+    num_x = len(keys)
+    num_y = len(learner_modules)
+    x_idx = np.arange(num_x)
+    y_idx = num_x + np.arange(num_y)
+
+    num_learners = problem.num_learners
+    num_modules = len(modules)
+
+    # Each block of constraints is given as (rows, columns, coefficients),
+    # with the sense and right-hand side of each row. Rows are numbered from
+    # zero within each block.
+    blocks = [
+        # Each learner is assigned to exactly one module.
+        ([y_learner], [y_idx], [np.ones(num_y)],
+         '=', np.ones(num_learners)),
+
+        # Minimum batch size for each activity.
+        ([y_module, k_module], [y_idx, x_idx],
+         [np.ones(num_y), np.full(num_x, -problem.min_batch)],
+         '>', np.zeros(num_modules)),
+
+        # Maximum batch size for each activity, but *not* for self-study.
+        ([y_module, k_module], [y_idx, x_idx],
+         [np.where(is_self_study[y_module], 0, 1),
+          np.where(is_self_study[k_module], 0, -problem.max_batch)],
+         '<', np.zeros(num_modules)),
+
+        # Classroom capacity of each activity.
+        ([y_module, k_module], [y_idx, x_idx],
+         [np.ones(num_y), -c_capacity[k_classroom]],
+         '<', np.zeros(num_modules)),
+
+        # Each teacher and classroom is used at most once.
+        ([k_teacher], [x_idx], [np.ones(num_x)],
+         '<', t_size),
+
+        ([k_classroom], [x_idx], [np.ones(num_x)],
+         '<', c_size),
+    ]
+
+    rows, cols, coeffs, sense, rhs = [], [], [], [], []
+    offset = 0
+
+    for block_rows, block_cols, block_coeffs, block_sense, block_rhs in blocks:
+        rows.extend(offset + block_row for block_row in block_rows)
+        cols.extend(block_cols)
+        coeffs.extend(block_coeffs)
+        sense.append(np.full(len(block_rhs), block_sense))
+        rhs.append(block_rhs)
+
+        offset += len(block_rhs)
+
+    A = coo_matrix((np.concatenate(coeffs),
+                    (np.concatenate(rows), np.concatenate(cols))),
+                   shape=(offset, num_x + num_y))
+
+    return Formulation(
+        keys=keys,
+        classrooms=classrooms,
+        teachers=teachers,
+        learner_modules=learner_modules,
+        obj=np.concatenate([np.zeros(num_x),
+                            preferences[y_learner, y_module]]),
+        lb=np.zeros(num_x + num_y),
+        ub=np.concatenate([np.minimum(c_size[k_classroom], t_size[k_teacher]),
+                           np.ones(num_y)]),
+        A=A.tocsr(),
+        sense=np.concatenate(sense),
+        rhs=np.concatenate(rhs).astype(float),
+    )
+
+
+def solve_gurobi(formulation: Formulation) -> _Solve:
+    """
+    Solves the given formulation with Gurobi, tracking the bounds during the
+    search.
+    """
+    from gurobipy import GRB, Model
+
+    m = Model()
+    v = m.addMVar(len(formulation.obj),
+                  lb=formulation.lb,
+                  ub=formulation.ub,
+                  obj=formulation.obj,
+                  vtype=GRB.INTEGER,
+                  name="v")
+
+    m.addMConstr(formulation.A, v, formulation.sense, formulation.rhs)
 
     runtimes = []
     upper_bounds = []
@@ -36,116 +231,201 @@ def ilp() -> Result:
     upper_bounds.append(m.objBound)
     runtimes.append(m.runtime)
 
-    assignments = _to_assignments(x.getAttr('X'), y.getAttr('X'))
-    runtimes = np.diff(runtimes, prepend=0).tolist()
+    return v.X, runtimes, lower_bounds, upper_bounds
 
-    return Result(assignments,
-                  runtimes,
-                  lower_bounds,
-                  upper_bounds,
-                  m.objVal)
 
+def solve_highs(formulation: Formulation) -> _Solve:
+    """
+    Solves the given formulation with HiGHS, via SciPy. SciPy does not expose
+    the solver's progress, so only the final bounds are tracked.
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
 
-def _make_model() -> Tuple[Model, MVar, MVar]:
-    m = Model()
-    problem = get_problem()
+    sense = formulation.sense
+    rhs = formulation.rhs
 
-    x = m.addMVar((len(problem.modules),
-                   len(problem.classrooms),
-                   len(problem.teachers)),
-                  vtype=GRB.BINARY,
-                  name="module_resources")
+    constraints = LinearConstraint(formulation.A,
+                                   np.where(sense == '<', -np.inf, rhs),
+                                   np.where(sense == '>', np.inf, rhs))
 
-    y = m.addMVar((len(problem.learners), len(problem.modules)),
-                  vtype=GRB.BINARY,
-                  obj=problem.preferences,  # noqa
-                  ub=problem.preferences > 0,  # preference indicator
-                  name="learner_module")
+    start = time.perf_counter()
+    res = milp(-formulation.obj,  # HiGHS minimises
+               integrality=np.ones_like(formulation.obj),
+               bounds=Bounds(formulation.lb, formulation.ub),
+               constraints=constraints)
 
-    for learner in range(problem.num_learners):
-        m.addConstr(y[learner, :].sum() == 1, "assignment")
+    if res.x is None:
+        raise RuntimeError(f"HiGHS did not find a solution: {res.message}")
 
-    for module in problem.modules:
-        res = x[module.id, :, :].sum()
+    runtime = time.perf_counter() - start
 
-        m.addConstr(y[:, module.id].sum() >= problem.min_batch * res,
-                    "min batch")
+    # Older SciPy versions do not report the dual bound. Then the upper bound
+    # is unknown.
+    dual_bound = getattr(res, "mip_dual_bound", None)
+    upper_bound = np.inf if dual_bound is None else -dual_bound
 
-        if module.id != SELF_STUDY_MODULE_ID:  # *not* for self-study
-            m.addConstr(y[:, module.id].sum() <= problem.max_batch * res,
-                        "max batch")
+    return res.x, [runtime], [-res.fun], [upper_bound]
 
-        rhs = [c.capacity * x[module.id, c.id, :].sum()
-               for c in problem.classrooms]
 
-        m.addConstr(y[:, module.id].sum() <= sum(rhs), "capacity")
+SOLVERS = {
+    "gurobi": solve_gurobi,
+    "highs": solve_highs,
+}
 
-        for classroom in problem.classrooms:
-            lhs = x[module.id, classroom.id, :].sum()
-            rhs = int(classroom.is_qualified_for(module))
 
-            m.addConstr(lhs <= rhs, "room type")
+def _classroom_classes(problem: Problem,
+                       compact: bool) -> List[List[Classroom]]:
+    """
+    Groups the classrooms into classes of interchangeable classrooms: those
+    with the same room type, capacity, and self-study flag. When not
+    ``compact``, each classroom is a class of its own.
+    """
+    if not compact:
+        return [[classroom] for classroom in problem.classrooms]
 
-        for teacher in problem.teachers:
-            lhs = x[module.id, :, teacher.id].sum()
-            rhs = int(teacher.is_qualified_for(module))
+    classes = defaultdict(list)
+
+    for classroom in problem.classrooms:
+        key = (classroom.room_type,
+               classroom.capacity,
+               classroom.self_study_allowed)
 
-            m.addConstr(lhs <= rhs, "teacher qualification")
+        classes[key].append(classroom)
+
+    return list(classes.values())
+
+
+def _teacher_classes(problem: Problem, compact: bool) -> List[List[Teacher]]:
+    """
+    Groups the teachers into classes of interchangeable teachers: those with
+    the same degree, and range of modules. When not ``compact``, each teacher
+    is a class of its own.
+    """
+    if not compact:
+        return [[teacher] for teacher in problem.teachers]
+
+    classes = defaultdict(list)
 
     for teacher in problem.teachers:
-        m.addConstr(x[:, :, teacher.id].sum() <= 1, "single use teacher")
+        key = (teacher.degree, teacher.frm_module, teacher.to_module)
+        classes[key].append(teacher)
 
-    for classroom in problem.classrooms:
-        m.addConstr(x[:, classroom.id, :].sum() <= 1, "single use classroom")
+    return list(classes.values())
 
-    return m, x, y
+
+def _expand(formulation: Formulation,
+            values: np.ndarray) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Returns the (classroom, teacher) pairs assigned to each module. Each
+    class' count is expanded into concrete, unused classrooms and teachers of
+    that class.
+    """
+    classrooms = [iter(c_class) for c_class in formulation.classrooms]
+    teachers = [iter(t_class) for t_class in formulation.teachers]
+
+    counts = np.round(values[:formulation.num_resource_vars]).astype(int)
+    activities = defaultdict(list)
+
+    for idx in np.flatnonzero(counts).tolist():
+        module, c_idx, t_idx = formulation.keys[idx].tolist()
+
+        for _ in range(counts[idx]):
+            classroom = next(classrooms[c_idx])
+            teacher = next(teachers[t_idx])
+
+            activities[module].append((classroom.id, teacher.id))
+
+    return activities
 
 
-def _to_assignments(x, y) -> List[List[int]]:
+def _learner_modules(problem: Problem,
+                     formulation: Formulation,
+                     values: np.ndarray) -> np.ndarray:
+    """
+    Returns the learner assignment variables, as a (learners, modules) array.
+    """
+    y = np.zeros((problem.num_learners, len(problem.modules)))
+    learners, modules = formulation.learner_modules.T
+
+    y[learners, modules] = values[formulation.num_resource_vars:]
+    return y
+
+
+def _to_assignments(problem: Problem,
+                    resources: Dict[int, List[Tuple[int, int]]],
+                    y) -> List[List[int]]:
     """
     Turns the solver's decision variables into a series of (learner, module,
     classroom, teacher) assignments, which are then stored to the file system.
+    The resources are the (classroom, teacher) pairs assigned to each module,
+    see ``_expand``.
+
+    The learners of each module are taken in order of decreasing ID. First,
+    each of the module's activities is assigned min_batch learners, which
+    ensures the minimum constraint is met for all activities. Next, these
+    activities are flood-filled with the remaining learners, in order, until
+    none remain to be assigned. Both steps assign consecutive learners to each
+    activity, so the activity of each learner follows directly from its
+    position among the module's learners.
     """
-    problem = get_problem()
-
-    assignments = []
-    counters = defaultdict(lambda: 0)
-
-    for module in range(len(problem.modules)):
-        # Select learners and activities belonging to each module, such
-        # that we can assign them below.
-        learners = [learner
-                    for learner in range(len(problem.learners))
-                    if y[learner, module] > .5]
-
-        activities = [(classroom, teacher)
-                      for classroom in range(len(problem.classrooms))
-                      for teacher in range(len(problem.teachers))
-                      if x[module, classroom, teacher] > .5]
-
-        # Assign at least min_batch number of learners to each activity.
-        # This ensures the minimum constraint is met for all activities.
-        for classroom, teacher in activities:
-            for _ in range(problem.min_batch):
-                assignment = (learners.pop(), module, classroom, teacher)
-                assignments.append(list(assignment))
-                counters[classroom] += 1
-
-        # Next we flood-fill these activities with learners, until none
-        # remain to be assigned.
-        for classroom, teacher in activities:
-            capacity = problem.classrooms[classroom].capacity
-
-            if module != SELF_STUDY_MODULE_ID:
-                capacity = min(problem.max_batch, capacity)
-
-            while learners and counters[classroom] < capacity:
-                assignment = (learners.pop(), module, classroom, teacher)
-                assignments.append(list(assignment))
-                counters[classroom] += 1
+    min_batch = problem.min_batch
+    num_modules = len(problem.modules)
+
+    # Learners of each module, grouped by module, and in order of decreasing
+    # ID within each module.
+    learners, modules = np.nonzero(np.asarray(y) > .5)
+    order = np.lexsort((-learners, modules))
+    learners, modules = learners[order], modules[order]
+
+    l_counts = np.bincount(modules, minlength=num_modules)
+    l_starts = np.cumsum(l_counts) - l_counts
+    positions = np.arange(len(learners)) - l_starts[modules]
+
+    # Activities of each module, grouped by module, and in the given order
+    # within each module.
+    activities = np.array([(module, classroom, teacher)
+                           for module, pairs in sorted(resources.items())
+                           for classroom, teacher in pairs],
+                          dtype=int).reshape(-1, 3)
+
+    a_modules, a_classrooms, a_teachers = activities.T
+
+    a_counts = np.bincount(a_modules, minlength=num_modules)
+    a_starts = np.cumsum(a_counts) - a_counts
+
+    capacities = np.array([c.capacity for c in problem.classrooms])
+    capacities = capacities[a_classrooms]
+    capacities = np.where(a_modules != SELF_STUDY_MODULE_ID,
+                          np.minimum(problem.max_batch, capacities),
+                          capacities)
+
+    # Capacity left in each activity after the first step, cumulated over
+    # all activities. The second step fills the module's activities in order,
+    # so the first activity whose cumulative capacity exceeds the learner's
+    # position (after the first step) is where the learner goes.
+    cum_remaining = np.cumsum(capacities - min_batch)
+    base = np.concatenate(([0], cum_remaining))[a_starts]
+
+    num_first = a_counts[modules] * min_batch
+    first = positions < num_first
+
+    idcs = np.where(first,
+                    a_starts[modules] + positions // max(min_batch, 1),
+                    np.searchsorted(cum_remaining,
+                                    base[modules] + positions - num_first,
+                                    side="right"))
+
+    # Learners beyond the capacity of their module's activities cannot be
+    # assigned. That does not happen for feasible solutions.
+    assert np.all(idcs < a_starts[modules] + a_counts[modules])
+
+    assignments = np.column_stack((learners,
+                                   modules,
+                                   a_classrooms[idcs],
+                                   a_teachers[idcs]))
 
     assert len(assignments) == problem.num_learners
-    return assignments
+    return assignments.tolist()
 
 
 def parse_args():
@@ -153,6 +433,12 @@ def parse_args():
 
     parser.add_argument("experiment", type=str)
     parser.add_argument("instance", type=int)
+    parser.add_argument("--compact", action="store_true",
+                        help="Solve the compact formulation, which groups "
+                             "interchangeable classrooms and teachers.")
+    parser.add_argument("--solver", choices=SOLVERS, default="gurobi",
+                        help="MILP solver to use. HiGHS is open-source, and "
+                             "ships with SciPy.")
 
     return parser.parse_args()
 
@@ -161,12 +447,12 @@ def main():
     args = parse_args()
 
     data_loc = f"experiments/{args.experiment}/{args.instance}.json"
-    res_loc = f"experiments/{args.experiment}/{args.instance}-ilp.json"
+    res_loc = f"experiments/{args.experiment}/{args.instance}-ilp.npz"
 
     problem = Problem.from_file(data_loc)
     set_problem(problem)
 
-    result = ilp()
+    result = ilp(args.compact, args.solver)
     result.to_file(res_loc)
 
     print(result)
@@ -1,41 +1,86 @@
+import time
+from collections import defaultdict
 from heapq import heappop, heappush
+from typing import Optional
 
 from numpy.random import Generator
 
 from src.classes import Problem, Solution
+from src.constants import REINSERT_MAX_PASSES, REINSERT_MAX_RUNTIME
 
 
 def reinsert_learner(current: Solution,
                      generator: Generator,
-                     problem: Problem) -> Solution:
+                     problem: Problem,
+                     max_passes: Optional[int] = REINSERT_MAX_PASSES,
+                     max_runtime: Optional[float] = REINSERT_MAX_RUNTIME
+                     ) -> Solution:
     """
-    Computes the best reinsertion moves for each learner, stores these in order,
-    and executes them. This improves the solution further by moving learners
-    into strictly improving assignments, if possible.
+    Computes the best reinsertion moves for each learner, stores these in
+    order, and executes them. This improves the solution further by moving
+    learners into strictly improving assignments, if possible.
+
+    Moves are executed in passes, until no improving moves remain, or the
+    given maximum number of passes or runtime (in seconds) is reached. After
+    the first pass, moves are only recomputed for learners that were moved, or
+    whose source or target activity has changed such that a previously
+    infeasible move may have become feasible.
     """
+    start = time.perf_counter()
+
     # Get all instruction activities, grouped by module. We only consider
     # moves out of self-study (self-study could be better as well, but the
     # structure of the repair operators makes it unlikely it is preferred over
     # the current learner assignment).
-    activities_by_module = current.activities_by_module()
-    del activities_by_module[problem.self_study_module]
+    activities_by_module = defaultdict(list)
 
-    moves = []
+    for activity in current.activities:
+        if activity.is_instruction():
+            activities_by_module[activity.module.id].append(activity)
 
-    for from_activity in current.activities:
-        if from_activity.num_learners <= problem.min_batch:
-            continue
+    # Learners (IDs) that cannot currently be moved, because their activity
+    # is at the minimum batch size (blocked), or the activity they would move
+    # into is full (waiting). These are reconsidered once that changes.
+    blocked = defaultdict(list)
+    waiting = defaultdict(list)
 
-        for learner in from_activity.learners:
-            for module_id in problem.most_preferred[learner.id]:
-                module = problem.modules[module_id]
+    to_check = [learner_id
+                for activity in current.activities
+                for learner_id in activity.learner_ids().tolist()]
 
-                if from_activity.is_self_study() \
-                        and not learner.prefers_over_self_study(module):
-                    break
+    num_passes = 0
+
+    while to_check:
+        if max_passes is not None and num_passes >= max_passes:
+            break
+
+        if max_runtime is not None \
+                and time.perf_counter() - start >= max_runtime:
+            break
+
+        num_passes += 1
+        moves = []
+
+        for learner_id in dict.fromkeys(to_check):  # unique, in order
+            learner = problem.learners[learner_id]
+            from_activity = current.activity_of(learner)
+
+            if from_activity.num_learners <= problem.min_batch:
+                blocked[from_activity.idx].append(learner_id)
+                continue
+
+            # Learners in self-study only move to modules they prefer over
+            # self-study.
+            if from_activity.is_self_study():
+                module_ids = problem.prefers_over_self_study[learner.id]
+            else:
+                module_ids = problem.most_preferred[learner.id]
+
+            for module_id in module_ids:
+                from_module_id = from_activity.module.id
 
                 gain = problem.preferences[learner.id, module_id]
-                gain -= problem.preferences[learner.id, from_activity.module.id]
+                gain -= problem.preferences[learner.id, from_module_id]
 
                 if gain <= 0:
                     # This module does not result in any gain. Since we go
@@ -52,20 +97,35 @@ def reinsert_learner(current: Solution,
                         item = (-gain, generator.random(),
                                 learner, from_activity, to_activity)
                         heappush(moves, item)
+                    else:
+                        waiting[to_activity.idx].append(learner_id)
 
-    if not moves:
-        return current
+        to_check = []
+        has_moved = set()  # tracks whether we've already moved a learner.
 
-    has_moved = set()  # tracks whether we've already moved a learner.
+        while len(moves) != 0:
+            *_, learner, from_activity, to_activity = heappop(moves)
 
-    while len(moves) != 0:
-        *_, learner, from_activity, to_activity = heappop(moves)
+            if learner in has_moved:
+                continue
+
+            if from_activity.num_learners <= problem.min_batch:
+                blocked[from_activity.idx].append(learner.id)
+                continue
+
+            if not to_activity.can_insert_learner():
+                waiting[to_activity.idx].append(learner.id)
+                continue
 
-        if learner not in has_moved \
-                and from_activity.num_learners > problem.min_batch \
-                and to_activity.can_insert_learner():
             from_activity.remove_learner(learner)
             to_activity.insert_learner(learner)
             has_moved.add(learner)
 
-    return reinsert_learner(current, generator, problem)
+            # The moved learner may have further improving moves from its new
+            # activity. Further, the source activity now has room for waiting
+            # learners, and the target activity may no longer block learners.
+            to_check.append(learner.id)
+            to_check.extend(waiting.pop(from_activity.idx, []))
+            to_check.extend(blocked.pop(to_activity.idx, []))
+
+    return current
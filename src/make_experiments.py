@@ -6,14 +6,13 @@ import argparse
 import csv
 import itertools
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, Union
 
 import numpy as np
 from iteround import saferound
 from pyDOE2 import fullfact
-from scipy.stats import expon, norm
 
 from src.classes import Problem
 
@@ -63,12 +62,12 @@ def parameter_levels(vary_third_degree: bool) -> dict[str, Any]:
 
 def make_and_write_instances(experiment: int,
                              values: dict[str, Any],
+                             seed: Union[int, np.random.SeedSequence],
                              tuning: bool = False,
                              dir_prefix: str = ""):
     """
-    A long but mostly straightforward function that makes the experiment
-    instances discussed in the paper. This function is legacy code, and has
-    mostly been copied verbatim from the bachelor thesis implementation.
+    Makes the experiment instances, and writes them to the experiments
+    directory.
     """
     if tuning:
         values['instances'] = 1
@@ -78,6 +77,28 @@ def make_and_write_instances(experiment: int,
 
     exp_dir.mkdir(parents=True, exist_ok=True)
 
+    problems = make_instances(experiment, values, seed)
+
+    for instance, problem in enumerate(problems, 1):
+        if tuning:
+            problem.to_file(exp_dir / f"{experiment}.json")  # noqa
+        else:
+            problem.to_file(exp_dir / f"{instance}.json")  # noqa
+
+
+def make_instances(
+        experiment: int,
+        values: dict[str, Any],
+        seed: Union[int, np.random.SeedSequence]
+) -> Iterator[Problem]:
+    """
+    A long but mostly straightforward function that makes the experiment
+    instances discussed in the paper. This function is legacy code, and has
+    mostly been copied from the bachelor thesis implementation. The random
+    instance data are drawn from a generator seeded with the given seed.
+    """
+    generator = np.random.default_rng(seed)
+
     def round_integers(*,
                        by_idx: bool = False,
                        by_roomtype: bool = False,
@@ -100,17 +121,12 @@ def make_and_write_instances(experiment: int,
         return dict(zip(by_item.keys(),
                         map(int, saferound(by_item.values(), places=0))))
 
-    # 1. Create the learner data.
-    learners = []
-    year = 0
-
-    for idx in range(values['learners']):
-        # fairly split the learners into six evenly spaced groups, so each
-        # nominal year has the same number of learners.
-        if not idx % (values['learners'] // 6 + 1):
-            year += 1
-
-        learners.append(dict(id=idx, year=year))
+    # 1. Create the learner data. The learners are fairly split into six
+    # evenly spaced groups, so each nominal year has the same number of
+    # learners.
+    years = np.arange(values['learners']) // (values['learners'] // 6 + 1) + 1
+    learners = [dict(id=idx, year=year)
+                for idx, year in enumerate(years.tolist())]
 
     # 2. Create classroom data.
     classrooms = []
@@ -179,26 +195,28 @@ def make_and_write_instances(experiment: int,
         module += values['modules']
 
     for instance in range(1, values['instances'] + 1):
-        # 5. Create the instance-specific learner preferences.
-        preferences = np.zeros((len(learners), len(modules)))
-        norm_vals = norm.rvs(loc=0,
-                             scale=values['progress'],
-                             size=(len(learners), len(values['courses'])))
+        # 5. Create the instance-specific learner preferences. Each learner
+        # has a single nonzero preference per course, for a module around
+        # the midpoint of their nominal year.
+        num_courses = len(values['courses'])
 
-        for course, _ in enumerate(values['courses']):
-            prefs = expon.rvs(scale=values['preferences'],
-                              size=(len(learners),))
+        norm_vals = generator.normal(loc=0,
+                                     scale=values['progress'],
+                                     size=(len(learners), num_courses))
 
-            for idx, learner in enumerate(learners):
-                midpoint = 8 * (learner['year'] - 1) + 4
-                norm_val = midpoint + norm_vals[idx, course]
-                loc = min(max(int(round(norm_val)), 0), values['modules'] - 1)
+        prefs = generator.exponential(scale=values['preferences'],
+                                      size=(len(learners), num_courses))
 
-                preferences[idx, values['modules'] * course + loc] \
-                    = round(prefs[idx], 3)
+        midpoints = 8 * (years - 1) + 4
+        locs = np.rint(midpoints[:, None] + norm_vals).astype(int)
+        locs = np.clip(locs, 0, values['modules'] - 1)
+        locs += values['modules'] * np.arange(num_courses)
 
-        # 6. Create instance and write to file.
-        problem = Problem(dict(
+        preferences = np.zeros((len(learners), len(modules)))
+        np.put_along_axis(preferences, locs, np.round(prefs, 3), axis=1)
+
+        # 6. Create instance.
+        yield Problem(dict(
             experiment=experiment,
             instance=instance,
             preferences=preferences,
@@ -211,22 +229,23 @@ def make_and_write_instances(experiment: int,
             max_batch=values['max_batch'],
         ))
 
-        if tuning:
-            problem.to_file(exp_dir / f"{experiment}.json")  # noqa
-        else:
-            problem.to_file(exp_dir / f"{instance}.json")  # noqa
-
 
 def main():
-    np.random.seed(42)
     args = parse_args()
 
     levels = parameter_levels(args.vary_third_degree)
     num_levels = [len(level) for level in levels.values()]
+    designs = fullfact(num_levels)
     experiments = []
 
-    with ThreadPoolExecutor() as executor:
-        for num, design in enumerate(fullfact(num_levels), 1):
+    # Each experiment has its own, independent random number stream, so the
+    # instances do not depend on the order in which experiments are made.
+    seeds = np.random.SeedSequence(42).spawn(len(designs))
+
+    with ProcessPoolExecutor() as executor:
+        futures = []
+
+        for num, (design, seed) in enumerate(zip(designs, seeds), 1):
             exp = {key: value[int(idx)]
                    for (key, value), idx in zip(levels.items(), design)}
 
@@ -234,12 +253,20 @@ def main():
             experiments.append(exp)
 
             if args.vary_third_degree:
-                executor.submit(make_and_write_instances, num, exp,
-                                dir_prefix="vq_")
+                futures.append(executor.submit(make_and_write_instances,
+                                               num, exp, seed,
+                                               dir_prefix="vq_"))
             elif args.tuning:
-                executor.submit(make_and_write_instances, num, exp, tuning=True)
+                # Tuning experiments have a single instance each.
+                exp["instances"] = 1
+                futures.append(executor.submit(make_and_write_instances,
+                                               num, exp, seed, tuning=True))
             else:
-                executor.submit(make_and_write_instances, num, exp)
+                futures.append(executor.submit(make_and_write_instances,
+                                               num, exp, seed))
+
+        for future in futures:  # raises if any experiment failed.
+            future.result()
 
     filename = "experiments" if not args.vary_third_degree else "vq"
     with open(f"experiments/{filename}.csv", "w", newline='') as fh:
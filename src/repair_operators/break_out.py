@@ -1,8 +1,9 @@
-from heapq import heappop
+from collections import defaultdict
+from heapq import heapify, heappop, heappush
 
 from numpy.random import Generator
 
-from src.classes import Activity, Problem, Solution
+from src.classes import Problem, Solution
 from src.constants import SELF_STUDY_MODULE_ID
 from .greedy_insert import greedy_insert
 
@@ -20,12 +21,11 @@ def break_out(destroyed: Solution,
     inserted into existing activities using ``greedy_insert``.
     """
     prefs = problem.preferences
+    histogram = _Histogram(problem, destroyed.unassigned)
 
-    unassigned = [learner.id for learner in destroyed.unassigned]
-    histogram = problem.preferences_by_module(unassigned)
-
-    while len(histogram) != 0:
-        _, module_id, to_assign_ids = heappop(histogram)
+    while histogram:
+        module_id, to_assign_ids = histogram.pop()
+        was_unassigned = set(to_assign_ids)
 
         module = problem.modules[module_id]
         to_assign = [problem.learners[learn_id] for learn_id in to_assign_ids]
@@ -34,6 +34,8 @@ def break_out(destroyed: Solution,
             classroom = destroyed.find_classroom_for(module)
             teacher = destroyed.find_teacher_for(module)
         except LookupError:
+            # Break out only ever uses up resources, so this module cannot be
+            # scheduled later on either.
             continue
 
         max_size = min(classroom.capacity, problem.max_batch)
@@ -55,13 +57,103 @@ def break_out(destroyed: Solution,
             if len(to_assign) >= max_size:
                 break
 
-        activity = Activity(to_assign[:max_size], classroom, teacher, module)
-
-        destroyed.add_activity(activity)
-        destroyed.unassigned -= set(activity.learners)
+        destroyed.add_activity(to_assign[:max_size],
+                               classroom,
+                               teacher,
+                               module)
 
-        return break_out(destroyed, generator, problem)
+        # The unassigned learners in the new activity are no longer
+        # unassigned. Snooping never takes more self-study learners than fit
+        # in the new activity, so no learners have become unassigned.
+        histogram.remove(learner.id for learner in to_assign[:max_size]
+                         if learner.id in was_unassigned)
 
     # Insert final learners into existing activities, if no new activity
     # can be scheduled.
     return greedy_insert(destroyed, generator, problem)
+
+
+class _Histogram:
+    """
+    Aggregate preferences of the unassigned learners, by module. Only modules
+    that are preferred over self-study are counted, and only modules for which
+    the minimum batch size is respected are available.
+
+    The histogram is updated incrementally as learners are assigned, and
+    forms a heap ordered by aggregate preference (high to low). Updated modules
+    are pushed anew, and outdated heap entries are skipped when popping.
+    """
+
+    def __init__(self, problem: Problem, unassigned: list):
+        self._problem = problem
+
+        self._learners = defaultdict(set)
+        self._aggregates = {}
+        self._versions = defaultdict(int)
+
+        for learner in unassigned:
+            for module_id in problem.prefers_over_self_study[learner.id]:
+                self._learners[module_id].add(learner.id)
+
+        prefs = problem.preferences
+
+        # Heap of (aggregate preference, module, version) tuples. Preferences
+        # are negative since heapq creates a min heap (and we need a max heap).
+        self._heap = []
+
+        for module_id, learner_ids in self._learners.items():
+            learner_ids = sorted(learner_ids)
+            self._aggregates[module_id] = prefs[learner_ids, module_id].sum()
+
+            if len(learner_ids) >= problem.min_batch:
+                self._heap.append((-self._aggregates[module_id], module_id, 0))
+
+        heapify(self._heap)
+
+    def __bool__(self):
+        while self._heap:
+            _, module_id, version = self._heap[0]
+
+            if version == self._versions[module_id]:
+                return True
+
+            heappop(self._heap)
+
+        return False
+
+    def pop(self) -> tuple[int, list[int]]:
+        """
+        Pops the module with the largest aggregate preference, and returns it
+        along with its unassigned learners (ordered by ID). The module is not
+        considered again, unless its learners change.
+        """
+        assert self, "Histogram is empty."
+
+        _, module_id, _ = heappop(self._heap)
+        self._versions[module_id] += 1
+
+        return module_id, sorted(self._learners[module_id])
+
+    def remove(self, learner_ids):
+        """
+        Removes the given learners, which have been assigned, from the
+        histogram.
+        """
+        problem = self._problem
+        prefs = problem.preferences
+        updated = set()
+
+        for learner_id in learner_ids:
+            for module_id in problem.prefers_over_self_study[learner_id]:
+                self._learners[module_id].discard(learner_id)
+                self._aggregates[module_id] -= prefs[learner_id, module_id]
+
+                updated.add(module_id)
+
+        for module_id in updated:
+            self._versions[module_id] += 1
+            version = self._versions[module_id]
+
+            if len(self._learners[module_id]) >= problem.min_batch:
+                item = (-self._aggregates[module_id], module_id, version)
+                heappush(self._heap, item)
@@ -2,7 +2,7 @@ from operator import attrgetter, methodcaller
 
 from numpy.random import Generator
 
-from src.classes import Activity, Problem, Solution
+from src.classes import Problem, Solution
 
 
 def greedy_insert(destroyed: Solution,
@@ -23,22 +23,20 @@ def greedy_insert(destroyed: Solution,
     unused_classrooms.sort(key=attrgetter("capacity"))
 
     activities = destroyed.activities_by_module()
+    unassigned = destroyed.unassigned
 
-    while len(destroyed.unassigned) != 0:
-        learner = destroyed.unassigned.pop()
+    while len(unassigned) != 0:
+        learner = unassigned.pop()
         inserted = False
 
         # Attempts to insert the learner into the most preferred, feasible
-        # instruction activity.
-        for module_id in problem.most_preferred[learner.id]:
+        # instruction activity, among those preferred over self-study.
+        for module_id in problem.prefers_over_self_study[learner.id]:
             module = problem.modules[module_id]
 
             if module not in activities:
                 continue
 
-            if not learner.prefers_over_self_study(module):
-                break
-
             if inserted := _insert(learner, activities[module]):
                 break
 
@@ -76,10 +74,10 @@ def greedy_insert(destroyed: Solution,
 
                 if activity.classroom.capacity < biggest_classroom.capacity:
                     current = activity.classroom
-                    activity.classroom = unused_classrooms.pop()
+                    destroyed.switch_classrooms(activity,
+                                                unused_classrooms.pop())
                     unused_classrooms.insert(0, current)
 
-                    destroyed.switch_classrooms(current, activity.classroom)
                     activity.insert_learner(learner)
                     break
 
@@ -90,7 +88,6 @@ def greedy_insert(destroyed: Solution,
                     new_activity = activity.split_with(classroom, teacher)
                     activity.insert_learner(learner)
 
-                    destroyed.add_activity(new_activity)
                     activities[problem.self_study_module].append(new_activity)
                     break
             else:
@@ -102,17 +99,14 @@ def greedy_insert(destroyed: Solution,
                 # This could be a problem if there are insufficient learners
                 # left. That has never happened so far, so the concern seems
                 # more theoretical than real.
-                learners = [destroyed.unassigned.pop()
-                            for _ in range(problem.min_batch)]
-
-                activity = Activity(learners, classroom, teacher,
-                                    problem.self_study_module)
+                learners = [unassigned.pop() for _ in range(problem.min_batch)]
 
                 # Since we popped this learner from the unassigned list before,
-                # it is not yet in the new activity.
-                activity.insert_learner(learner)
+                # it is not yet among the new activity's learners.
+                learners.append(learner)
 
-                destroyed.add_activity(activity)
+                activity = destroyed.add_activity(learners, classroom, teacher,
+                                                  problem.self_study_module)
                 activities[problem.self_study_module].append(activity)
 
     return destroyed
@@ -1,7 +1,9 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
 from src.constants import SELF_STUDY_MODULE_ID
+from .utils import attribute, num_distinct, to_array
 
 
 def activity_size(problem, solution: List[Tuple]) -> bool:
@@ -9,18 +11,18 @@ def activity_size(problem, solution: List[Tuple]) -> bool:
     Verifies each activity satisfies both the minimum and maximum group size
     constraints.
     """
-    classroom_learners = defaultdict(set)
-
-    for learner, module, classroom, _ in solution:
-        classroom_learners[classroom, module].add(learner)
+    learners, modules, classrooms, _ = to_array(solution).T
 
-    for (classroom, module), learners in classroom_learners.items():
-        max_capacity = problem.classrooms[classroom].capacity
+    # Activities are identified by their (classroom, module) pair.
+    activities = classrooms * len(problem.modules) + modules
+    sizes = num_distinct(activities, learners)
 
-        if module != SELF_STUDY_MODULE_ID:
-            max_capacity = min(problem.max_batch, max_capacity)
+    classrooms, modules = np.divmod(np.unique(activities),
+                                    len(problem.modules))
+    max_capacity = attribute(problem.classrooms, "capacity")[classrooms]
 
-        if not problem.min_batch <= len(learners) <= max_capacity:
-            return False
+    max_capacity = np.where(modules != SELF_STUDY_MODULE_ID,
+                            np.minimum(problem.max_batch, max_capacity),
+                            max_capacity)
 
-    return True
+    return bool(np.all((problem.min_batch <= sizes) & (sizes <= max_capacity)))
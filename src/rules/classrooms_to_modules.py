@@ -1,6 +1,9 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def classrooms_to_modules(problem, solution: List[Tuple]) -> bool:
     """
@@ -8,12 +11,10 @@ def classrooms_to_modules(problem, solution: List[Tuple]) -> bool:
     of classrooms available, and each classroom is assigned to *one* module
     only.
     """
-    classroom_modules = defaultdict(set)
-
-    for _, module, classroom, _ in solution:
-        classroom_modules[classroom].add(module)
+    _, modules, classrooms, _ = to_array(solution).T
+    num_modules = num_distinct(classrooms, modules)
 
-    if len(classroom_modules) > len(problem.classrooms):
+    if len(num_modules) > len(problem.classrooms):
         return False
 
-    return all(len(value) == 1 for value in classroom_modules.values())
+    return bool(np.all(num_modules == 1))
@@ -1,17 +1,18 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def classrooms_to_teachers(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each classroom is assigned to only *one* teacher.
     """
-    classroom_teachers = defaultdict(set)
-
-    for *_, classroom, teacher in solution:
-        classroom_teachers[classroom].add(teacher)
+    *_, classrooms, teachers = to_array(solution).T
+    num_teachers = num_distinct(classrooms, teachers)
 
-    if len(classroom_teachers) > len(problem.classrooms):
+    if len(num_teachers) > len(problem.classrooms):
         return False
 
-    return all(len(value) == 1 for value in classroom_teachers.values())
+    return bool(np.all(num_teachers == 1))
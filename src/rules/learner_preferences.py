@@ -1,10 +1,14 @@
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import to_array
+
 
 def learner_preferences(problem, solution: List[Tuple]) -> bool:
     """
     Verifies learners are all assigned to modules they are eligible to take,
     that is, hold strictly positive preferences for.
     """
-    return all(problem.preferences[learner, module] > 0
-               for learner, module, *_ in solution)
+    learners, modules, *_ = to_array(solution).T
+    return bool(np.all(problem.preferences[learners, modules] > 0))
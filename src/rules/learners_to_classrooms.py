@@ -1,14 +1,13 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def learners_to_classrooms(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each learner is assigned to *one* classroom.
     """
-    learner_classrooms = defaultdict(set)
-
-    for learner, _, classroom, _ in solution:
-        learner_classrooms[learner].add(classroom)
-
-    return all(len(value) == 1 for value in learner_classrooms.values())
+    learners, _, classrooms, _ = to_array(solution).T
+    return bool(np.all(num_distinct(learners, classrooms) == 1))
@@ -1,18 +1,19 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def learners_to_modules(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each learner is assigned to *one* module, and all learners are
     assigned.
     """
-    learner_modules = defaultdict(set)
-
-    for learner, module, *_ in solution:
-        learner_modules[learner].add(module)
+    learners, modules, *_ = to_array(solution).T
+    num_modules = num_distinct(learners, modules)
 
-    if len(learner_modules) != problem.num_learners:
+    if len(num_modules) != problem.num_learners:
         return False
 
-    return all(len(value) == 1 for value in learner_modules.values())
+    return bool(np.all(num_modules == 1))
@@ -1,14 +1,13 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def learners_to_teachers(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each learner is assigned to *one* teacher.
     """
-    learner_teachers = defaultdict(set)
-
-    for learner, *_, teacher in solution:
-        learner_teachers[learner].add(teacher)
-
-    return all(len(value) == 1 for value in learner_teachers.values())
+    learners, *_, teachers = to_array(solution).T
+    return bool(np.all(num_distinct(learners, teachers) == 1))
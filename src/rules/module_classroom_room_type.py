@@ -1,21 +1,25 @@
 from typing import List, Tuple
 
+import numpy as np
+
+from src.constants import SELF_STUDY_MODULE_ID
+from .utils import attribute, to_array
+
 
 def module_classroom_room_type(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each classroom-module assignment satisfies the room type
     requirement.
     """
-    classrooms = {}
-
-    for _, module, classroom, _ in solution:
-        classrooms[classroom] = module
+    _, modules, classrooms, _ = to_array(solution).T
 
-    for classroom_idx, module_idx in classrooms.items():
-        classroom = problem.classrooms[classroom_idx]
-        module = problem.modules[module_idx]
+    room_types = attribute(problem.classrooms, "room_type")[classrooms]
+    required = attribute(problem.modules, "room_type")[modules]
 
-        if not classroom.is_qualified_for(module):
-            return False
+    # Self-study modules need not match the room type, but instead require a
+    # classroom that allows self-study.
+    self_study = attribute(problem.classrooms, "self_study_allowed")
 
-    return True
+    return bool(np.all(np.where(modules == SELF_STUDY_MODULE_ID,
+                                self_study[classrooms],
+                                room_types == required)))
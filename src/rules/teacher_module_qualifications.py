@@ -1,21 +1,26 @@
 from typing import List, Tuple
 
+import numpy as np
+
+from src.constants import SELF_STUDY_MODULE_ID
+from .utils import attribute, to_array
+
 
 def teacher_module_qualifications(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each teacher-module assignment satisfies the required teacher
     qualification.
     """
-    teacher_modules = {}
-
-    for _, module, _, teacher in solution:
-        teacher_modules[teacher] = module
+    _, modules, _, teachers = to_array(solution).T
 
-    for teacher_idx, module_idx in teacher_modules.items():
-        teacher = problem.teachers[teacher_idx]
-        module = problem.modules[module_idx]
+    degrees = attribute(problem.teachers, "degree")[teachers]
+    frm_modules = attribute(problem.teachers, "frm_module")[teachers]
+    to_modules = attribute(problem.teachers, "to_module")[teachers]
+    qualifications = attribute(problem.modules, "qualification")[modules]
 
-        if not teacher.is_qualified_for(module):
-            return False
+    qualified = (degrees <= qualifications) \
+        & (frm_modules <= modules) \
+        & (modules < to_modules)
 
-    return True
+    # Every teacher is qualified to supervise self-study.
+    return bool(np.all(qualified | (modules == SELF_STUDY_MODULE_ID)))
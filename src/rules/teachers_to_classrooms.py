@@ -1,18 +1,19 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def teachers_to_classrooms(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each teacher is assigned to *one* classroom, and at most all
     teachers are in use.
     """
-    teacher_classrooms = defaultdict(set)
-
-    for *_, classroom, teacher in solution:
-        teacher_classrooms[teacher].add(classroom)
+    *_, classrooms, teachers = to_array(solution).T
+    num_classrooms = num_distinct(teachers, classrooms)
 
-    if len(teacher_classrooms) > len(problem.teachers):
+    if len(num_classrooms) > len(problem.teachers):
         return False
 
-    return all(len(value) == 1 for value in teacher_classrooms.values())
+    return bool(np.all(num_classrooms == 1))
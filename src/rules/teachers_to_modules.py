@@ -1,14 +1,13 @@
-from collections import defaultdict
 from typing import List, Tuple
 
+import numpy as np
+
+from .utils import num_distinct, to_array
+
 
 def teachers_to_modules(problem, solution: List[Tuple]) -> bool:
     """
     Verifies each teacher is assigned to *one* module.
     """
-    teacher_modules = defaultdict(set)
-
-    for _, module, _, teacher in solution:
-        teacher_modules[teacher].add(module)
-
-    return all(len(value) == 1 for value in teacher_modules.values())
+    _, modules, _, teachers = to_array(solution).T
+    return bool(np.all(num_distinct(teachers, modules) == 1))
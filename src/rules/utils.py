@@ -0,0 +1,35 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+
+
+def to_array(solution: Union[List[Tuple], np.ndarray]) -> np.ndarray:
+    """
+    Returns the (learner, module, classroom, teacher) assignments of the
+    passed-in solution as an (n, 4) integer array.
+    """
+    return np.asarray(solution, dtype=int).reshape(-1, 4)
+
+
+def num_distinct(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of distinct values associated with each distinct key.
+    """
+    if len(keys) == 0:
+        return np.zeros(0, dtype=int)
+
+    # Each (key, value) pair is encoded as a single integer, so the distinct
+    # pairs can be found with a one-dimensional np.unique.
+    num_values = values.max() + 1
+    pairs = np.unique(keys * num_values + values)
+    _, counts = np.unique(pairs // num_values, return_counts=True)
+
+    return counts
+
+
+def attribute(entities: list, name: str) -> np.ndarray:
+    """
+    Returns the given attribute of each of the passed-in entities (e.g.,
+    classrooms), as an array.
+    """
+    return np.array([getattr(entity, name) for entity in entities])
@@ -1,39 +1,101 @@
 import argparse
-
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
 import numpy.random as rnd
 from ConfigSpace import ConfigurationSpace, UniformFloatHyperparameter
-from alns import ALNS
 from alns.stop import MaxIterations
 from alns.weights import SimpleWeights
 from smac.facade.smac_hpo_facade import SMAC4HPO
 from smac.scenario.scenario import Scenario
 
 import src.constants
-from src.classes import Problem
+from src.classes import InPlaceALNS, Problem
 from src.constants import get_criterion
 from src.destroy_operators import DESTROY_OPERATORS
-from src.functions import initial_solution, set_problem
+from src.functions import initial_solution
 from src.local_search import reinsert_learner
 from src.repair_operators import REPAIR_OPERATORS
 
 
+# Number of tuning instances, and iterations of each evaluation run.
+NUM_INSTANCES = 144
+ITERATIONS = 1_000
+
+# Number of parsed tuning instances each worker process keeps in memory.
+PROBLEM_CACHE_SIZE = 8
+
+
 def parse_args():
     parser = argparse.ArgumentParser(prog="tune")
     parser.add_argument("seed", type=int)
     parser.add_argument("--out_dir", default="out/smac")
     parser.add_argument("--time_limit", type=int, default=3600)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of configurations to evaluate "
+                             "concurrently, each in its own process.")
+    parser.add_argument("--cache_dir", default="out/evaluations",
+                        help="Directory of completed evaluations, which are "
+                             "re-used rather than evaluated again.")
+
+    parser.add_argument("--racing", action="store_true",
+                        help="Race configurations with successive halving, "
+                             "rather than using SMAC's optimiser.")
+    parser.add_argument("--configs", type=int, default=81,
+                        help="Number of configurations to start racing with.")
+    parser.add_argument("--eta", type=int, default=3,
+                        help="Only the best 1 / eta configurations of each "
+                             "round are promoted to the next round.")
 
     return parser.parse_args()
 
 
-def run_alns(config, instance, seed):
-    problem = Problem.from_file(f"experiments/tuning/{instance}.json")
-    set_problem(problem)
-
-    generator = rnd.default_rng(seed)
-    alns = ALNS(generator)  # noqa
+@lru_cache(maxsize=PROBLEM_CACHE_SIZE)
+def load_problem(instance: str) -> Problem:
+    """
+    Loads the tuning instance. Each worker process keeps only the most recently
+    used instances, rather than all of them, and re-uses those for further
+    evaluations on the same instance.
+    """
+    return Problem.from_file(f"experiments/tuning/{instance}.json")
+
+
+def run_alns(config,
+             instance,
+             seed,
+             iterations: int = ITERATIONS,
+             cache_dir: Optional[str] = None):
+    """
+    Evaluates the configuration on the given instance and seed, for the given
+    number of iterations, and returns the best objective. If a cache directory
+    is given, completed evaluations are stored there, and re-used when the same
+    evaluation is requested again.
+    """
+    if cache_dir is not None:
+        key = dict(config=config.get_dictionary(),
+                   instance=instance,
+                   seed=seed,
+                   iterations=iterations)
+
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode())
+        loc = Path(cache_dir) / f"{digest.hexdigest()}.json"
+
+        if loc.exists():
+            with open(loc, "r") as fh:
+                return json.load(fh)["objective"]
 
     src.constants.DEGREE_OF_DESTRUCTION = config["dod"]
+    problem = load_problem(instance)
+
+    generator = rnd.default_rng(seed)
+    alns = InPlaceALNS(generator)
 
     for operator in DESTROY_OPERATORS:
         alns.add_destroy_operator(operator)
@@ -43,10 +105,10 @@ def run_alns(config, instance, seed):
 
     alns.on_best(reinsert_learner)
 
-    init = initial_solution()
-    stop = MaxIterations(1_000)
+    init = initial_solution(problem)
+    stop = MaxIterations(iterations)
     criterion = get_criterion(init.objective(), stop)
-    weights = [config["w" + str(idx + 1)] for idx in range(4)]
+    weights = [config["w" + str(idx + 1)] for idx in range(3)]
     weights.append(0)  # the fourth weight to the ALNS package is unused
 
     weights = SimpleWeights(weights,
@@ -60,7 +122,84 @@ def run_alns(config, instance, seed):
                        stop,
                        problem=problem)
 
-    return res.best_state.objective()
+    objective = res.best_state.objective()
+
+    if cache_dir is not None:
+        # Several workers may write to the cache at once, so each evaluation
+        # is written to a temporary file first, and then moved into place.
+        loc.parent.mkdir(parents=True, exist_ok=True)
+        tmp_loc = f"{loc}.{os.getpid()}.tmp"
+
+        with open(tmp_loc, "w") as fh:
+            json.dump(key | dict(objective=objective), fh)
+
+        os.replace(tmp_loc, loc)
+
+    return objective
+
+
+def race(args, cs: ConfigurationSpace):
+    """
+    Races configurations from the configuration space using successive
+    halving. All configurations are first evaluated with a small iteration
+    budget, on a few instances. Only the best 1 / eta of them are promoted to
+    the next round, which has eta times the budget, and eta times as many
+    instances. The final round uses the full budget, and all instances.
+    """
+    cs.seed(args.seed)
+    configs = [cs.get_default_configuration()]
+    configs.extend(cs.sample_configuration() for _ in range(args.configs - 1))
+
+    # Instances are raced in a random order, with one seed per instance. All
+    # configurations are evaluated on the same instances and seeds, so they
+    # are compared fairly.
+    generator = rnd.default_rng(args.seed)
+    instances = generator.permutation(np.arange(1, NUM_INSTANCES + 1))
+    seeds = generator.integers(2 ** 31, size=NUM_INSTANCES)
+
+    # Number of rounds, as one plus the integer logarithm of the number of
+    # configurations in base eta. A floating-point logarithm truncates exact
+    # powers of eta incorrectly.
+    num_rounds = 1
+    num_configs = args.configs
+
+    while num_configs >= args.eta:
+        num_configs //= args.eta
+        num_rounds += 1
+
+    func = partial(_evaluate, cache_dir=args.cache_dir)
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        for round_idx in range(num_rounds):
+            fraction = args.eta ** (round_idx - num_rounds + 1)
+            iterations = max(int(fraction * ITERATIONS), 1)
+            num_instances = max(math.ceil(fraction * NUM_INSTANCES), 1)
+
+            print(f"Round {round_idx + 1}: {len(configs)} configurations, "
+                  f"{iterations} iterations, {num_instances} instances.")
+
+            todo = [(config, str(instance), int(seed), iterations)
+                    for config in configs
+                    for instance, seed in zip(instances[:num_instances],
+                                              seeds[:num_instances])]
+
+            objectives = np.fromiter(executor.map(func, todo), dtype=float)
+            costs = objectives.reshape(len(configs), num_instances).mean(1)
+
+            ranking = np.argsort(costs, kind="stable")
+            costs = costs[ranking]
+            configs = [configs[idx] for idx in ranking]
+
+            if round_idx < num_rounds - 1:
+                num_promoted = max(len(configs) // args.eta, 1)
+                configs = configs[:num_promoted]
+
+    return configs[0], costs[0], num_instances
+
+
+def _evaluate(args, cache_dir: Optional[str]) -> float:
+    config, instance, seed, iterations = args
+    return run_alns(config, instance, seed, iterations, cache_dir)
 
 
 def main():
@@ -73,17 +212,29 @@ def main():
     cs.add_hyperparameter(UniformFloatHyperparameter("decay", .5, 1, .8))
     cs.add_hyperparameter(UniformFloatHyperparameter("dod", .1, .5, .35))
 
+    if args.racing:
+        # Print best configuration, its average cost on the full budget, and
+        # the number of instances it was evaluated on.
+        config, cost, num_instances = race(args, cs)
+
+        print(config)
+        print(cost, num_instances)
+        return
+
     scenario = Scenario({
         "run_obj": "quality",
         "wallclock_limit": args.time_limit,
         "cs": cs,
         "deterministic": False,
-        "instances": [[str(inst + 1)] for inst in range(144)],
+        "instances": [[str(inst + 1)] for inst in range(NUM_INSTANCES)],
         "output_dir": args.out_dir,
     })
 
     rng = rnd.RandomState(args.seed)
-    smac = SMAC4HPO(scenario=scenario, tae_runner=run_alns, rng=rng)
+    smac = SMAC4HPO(scenario=scenario,
+                    tae_runner=partial(run_alns, cache_dir=args.cache_dir),
+                    rng=rng,
+                    n_jobs=args.workers)
 
     config = smac.optimize()
     rh = smac.get_runhistory()
@@ -1,31 +1,105 @@
-import sys
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
 
+import numpy as np
+
+from src.batch import experiments, instances
 from src.classes import Problem, Result
 from src.rules import RULES
 
+METHODS = ["ilp", "heuristic"]
 
-def main():
-    experiment = sys.argv[1]
-    instance = sys.argv[2]
 
+def parse_args():
+    parser = argparse.ArgumentParser(prog="validator",
+                                     description="Verifies solutions satisfy "
+                                                 "the imposed constraints.")
+
+    parser.add_argument("experiment",
+                        help="Experiment to validate. When no instance is "
+                             "given, all instances of the experiment are "
+                             "validated. In that case, several experiments "
+                             "may be given as a range, e.g. 1-72.")
+
+    parser.add_argument("instance", type=int, nargs="?", default=None)
+
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes, when validating "
+                             "all instances. Defaults to the number of "
+                             "processors on the machine.")
+
+    parser.add_argument("--report", type=str, default=None,
+                        help="Location to write a JSON report of the "
+                             "validation results to.")
+
+    return parser.parse_args()
+
+
+def validate(experiment: str, instance: int) -> List[dict]:
+    """
+    Validates the solutions of all methods for the given experiment instance.
+    Returns a list of records, one per method, with the validation status
+    ('valid', 'invalid', or 'missing'), and the names of the violated rules.
+    """
     data_loc = f"experiments/{experiment}/{instance}.json"
     problem = Problem.from_file(data_loc)
 
-    valid = True
+    records = []
 
-    for method in ["ilp", "heuristic"]:
-        path = f"experiments/{experiment}/{instance}-{method}.json"
+    for method in METHODS:
+        path = f"experiments/{experiment}/{instance}-{method}.npz"
+        record = dict(experiment=experiment,
+                      instance=instance,
+                      method=method,
+                      path=path,
+                      violations=[])
 
         try:
             result = Result.from_file(path)
         except FileNotFoundError:
-            print(f"{path}: solution file does not exist.")
+            record['status'] = "missing"
         else:
-            for rule in RULES:
-                if not rule(problem, result.assignments):
-                    valid = False
-                    print(f"{path}: solution violates {rule.__name__}.")
+            # The rules operate on arrays, so we convert only once.
+            assignments = np.array(result.assignments, dtype=int)
+
+            record['violations'] = [rule.__name__ for rule in RULES
+                                    if not rule(problem, assignments)]
+
+            record['status'] = "invalid" if record['violations'] else "valid"
+
+        records.append(record)
+
+    return records
+
+
+def main():
+    args = parse_args()
+
+    if args.instance is not None:
+        records = validate(args.experiment, args.instance)
+    else:
+        todo = [(experiment, instance)
+                for experiment in experiments([args.experiment])
+                for instance in instances(experiment)]
+
+        with ProcessPoolExecutor(args.workers) as executor:
+            results = executor.map(validate, *zip(*todo)) if todo else []
+            records = [record for result in results for record in result]
+
+    for record in records:
+        if record['status'] == "missing":
+            print(f"{record['path']}: solution file does not exist.")
+
+        for rule in record['violations']:
+            print(f"{record['path']}: solution violates {rule}.")
+
+    if args.report is not None:
+        with open(args.report, "w") as file:
+            json.dump(records, file, indent=2)
 
+    valid = all(record['status'] != "invalid" for record in records)
     exit(0 if valid else 1)
 
 
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from src.classes import Problem
+from src.functions import set_problem
+from src.ilp import ilp, make_formulation
+from src.rules import RULES
+
+NUM_MODULES = 48
+
+
+def make_problem(seed: int = 1) -> Problem:
+    """
+    Makes a small instance of two courses, with several identical classrooms
+    and teachers, so the compact formulation groups these into classes.
+    """
+    generator = np.random.default_rng(seed)
+    num_learners = 60
+
+    modules = [dict(id=course * NUM_MODULES + mod,
+                    room_type=course + 1,
+                    qualification=2 - (mod >= NUM_MODULES // 2))
+               for course in range(12)
+               for mod in range(NUM_MODULES)]
+
+    classrooms = [dict(id=idx,
+                       room_type=1 if idx < 6 else 2,
+                       capacity=16,
+                       self_study_allowed=idx < 6)
+                  for idx in range(8)]
+    classrooms.append(dict(id=8,
+                           room_type=999,
+                           capacity=80,
+                           self_study_allowed=True))
+
+    teachers = [dict(id=idx,
+                     degree=1 + idx % 2,
+                     frm_module=(idx // 4) * NUM_MODULES,
+                     to_module=(idx // 4 + 1) * NUM_MODULES)
+                for idx in range(8)]
+
+    # Each learner prefers one of the first few modules of both courses.
+    preferences = np.zeros((num_learners, len(modules)))
+
+    for course in range(2):
+        cols = course * NUM_MODULES + generator.integers(4, size=num_learners)
+        prefs = generator.exponential(2, size=num_learners)
+        preferences[np.arange(num_learners), cols] = np.round(prefs, 3)
+
+    return Problem(dict(experiment=0,
+                        instance=seed,
+                        preferences=preferences,
+                        learners=[dict(id=idx, year=1)
+                                  for idx in range(num_learners)],
+                        classrooms=classrooms,
+                        modules=modules,
+                        teachers=teachers,
+                        penalty=.5,
+                        min_batch=5,
+                        max_batch=30))
+
+
+def test_compact_formulation_is_smaller():
+    problem = make_problem()
+
+    regular = make_formulation(problem, compact=False)
+    compact = make_formulation(problem, compact=True)
+
+    assert compact.num_resource_vars < regular.num_resource_vars
+    assert len(compact.learner_modules) == len(regular.learner_modules)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_compact_solution_is_optimal_and_valid(seed: int):
+    problem = make_problem(seed)
+    set_problem(problem)
+
+    regular = ilp(compact=False, solver="highs")
+    compact = ilp(compact=True, solver="highs")
+
+    # Both formulations model the same problem, so their optimal objectives
+    # must agree.
+    assert compact.objective == pytest.approx(regular.objective)
+
+    assignments = np.array(compact.assignments, dtype=int)
+    assert len(assignments) == problem.num_learners
+
+    for rule in RULES:
+        assert rule(problem, assignments), rule.__name__